@@ -1,25 +1,25 @@
 import fitz
-from docx import Document
-from docx.shared import Cm
-from PIL import Image
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import logging
 from datetime import datetime
-from docx2pdf import convert
-import math
 import threading
+from imposicion import impose_pdf, load_layout
+from rasterizador import render_pages
+from lotes import run_days_concurrently
+from cache_guias import OUTPUTS, cached_call
+from bitacora import Journal
+from indice_guias import safe_index_pdf
+from clasificador import classify_pdf, pair_pages
+from duplicados import dedupe_weekend
+from metricas import run, timed_iter
+from eventos_ui import EventBus
 
 # Configuración de registro (logs)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def update_progress(root, progress_bar, status_label, progress, message):
-    progress_bar['value'] = progress
-    status_label.config(text=message)
-    root.update_idletasks()
-
 def get_day_from_filename(filename):
     if 'viernes' in filename.lower():
         return 'Viernes'
@@ -30,88 +30,135 @@ def get_day_from_filename(filename):
     else:
         return ''
 
-def pdf_to_jpg(pdf_path, output_folder, min_width, min_height, day, pdf_info_text, progress_bar, status_label, root):
-    pdf_document = fitz.open(pdf_path)
-    total_pages = len(pdf_document)
-    pedidos = total_pages // 2
-    pdf_info_text.insert(tk.END, f"{os.path.basename(pdf_path)} ({day}): {total_pages} páginas, {pedidos} pedidos\n")
-
-    for page_number in range(total_pages):
-        page = pdf_document.load_page(page_number)
-        pix = page.get_pixmap()
-        if pix.width < min_width or pix.height < min_height:
-            scale_factor = max(min_width / pix.width, min_height / pix.height)
-            pix = page.get_pixmap(matrix=fitz.Matrix(scale_factor, scale_factor))
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        output_path = f"{output_folder}/{page_number + 1:04d}.jpg"
-        img.save(output_path, quality=100)
-        logger.info(f"Guardado {output_path}")
-        progress = ((page_number + 1) / total_pages) * 100
-        update_progress(root, progress_bar, status_label, progress, f"Convirtiendo página {page_number + 1} de {total_pages} del archivo {os.path.basename(pdf_path)}")
-
-    pdf_document.close()
-
-def process_images(image_folder, day, pdf_info_text, progress_bar, status_label, root, prefix=""):
-    doc = Document()
-    for section in doc.sections:
-        section.left_margin = Cm(0.5)
-        section.right_margin = Cm(0.5)
-        section.top_margin = Cm(0.5)
-        section.bottom_margin = Cm(0.5)
-
-    directory = image_folder
-    logger.info(f"Directorio seleccionado: {directory}")
-    image_files = sorted([f for f in os.listdir(directory) if f.endswith('.jpg')])
-    desired_width = Cm(7.59)
-    desired_height = Cm(13.02)
-    image_count = 0
-    total_imagenes_inicio = len(image_files)
-    logger.info("Agregando las imágenes al documento...")
-    for image_file in image_files:
-        img_path = os.path.join(directory, image_file)
-        img = Image.open(img_path)
-        img.thumbnail((desired_width, desired_height))
-        if image_count == 0:
-            table = doc.add_table(rows=2, cols=2)
-            table.autofit = False
-            table.allow_autofit = False
-        cell = table.cell(image_count // 2, image_count % 2)
-        run = cell.paragraphs[0].add_run()
-        run.add_picture(img_path, width=desired_width, height=desired_height)
-        image_count += 1
-        if image_count == 4:
-            doc.add_page_break()
-            image_count = 0
-
-    hojas_de_4_imagenes = math.ceil(total_imagenes_inicio / 4)
+# Orden de los días: un pedido repetido se conserva en el más temprano
+WEEKEND_DAYS = ('Viernes', 'Sábado', 'Domingo')
+
+def weekend_paths(file_paths):
+    """
+    {día: pdf} de viernes a domingo según el nombre de cada archivo. Si algún
+    nombre no dice el día, o dos archivos son del mismo día, lanza ValueError
+    con la lista de archivos: ninguno se descarta en silencio.
+    """
+    by_day = {}
+    for file_path in file_paths:
+        by_day.setdefault(get_day_from_filename(file_path), []).append(os.path.basename(file_path))
+    problems = [f"Sin día en el nombre: {', '.join(by_day[''])}"] if '' in by_day else []
+    problems += [f"Varios archivos de {day}: {', '.join(names)}"
+                 for day, names in by_day.items() if day and len(names) > 1]
+    if problems:
+        raise ValueError("\n".join(problems))
+    paths = {get_day_from_filename(file_path): file_path for file_path in file_paths}
+    return {day: paths[day] for day in WEEKEND_DAYS if day in paths}
+
+def pdf_to_jpg(pdf_path, output_folder, min_width, min_height, progress=None, workers=None, pages=None):
+    # Genera (page_number, imagen) en memoria; solo escribe los JPEG en disco
+    # si se pidió una carpeta de salida. pages limita el render a esas páginas
+    def on_progress(done, total):
+        if progress:
+            progress((done / total) * 100, f"Convirtiendo página {done} de {total} del archivo {os.path.basename(pdf_path)}")
+
+    for page_number, img in render_pages(pdf_path, pages=pages, min_size=(min_width, min_height), mode="L",
+                                         workers=workers, progress=on_progress):
+        if output_folder:
+            output_path = f"{output_folder}/{page_number + 1:04d}.jpg"
+            img.save(output_path, quality=100)
+            logger.info(f"Guardado {output_path}")
+        yield page_number, img
+
+def index_sheets(pdf_path, output_path, sheets):
+    """
+    Índice tracking/pedido/SKU → hoja donde quedó cada página (`sheets`, como
+    la llena impose_pdf). Se indexa con los pares guía/slip: reindexar un
+    archivo reemplaza sus filas y sin pares se perderían las de split_and_compile.
+    """
+    pairs, _ = pair_pages(classify_pdf(pdf_path))
+    safe_index_pdf(pdf_path, {p: (output_path, sheet) for p, sheet in enumerate(sheets, 1)}, pairs)
+
+def process_images(pdf_path, day, prefix="", progress=None, output_dir="", journal=None):
+    logger.info(f"Archivo seleccionado: {pdf_path}")
     fecha_actual = datetime.now().strftime("%d-%m-%Y")
-    nombre_archivo_doc = f"{prefix}Guias Shein {fecha_actual} {day} medidas pequeñas4.docx"
-    nombre_archivo_pdf = f"{prefix}Guias Shein {fecha_actual} {day} medidas pequeñas4.pdf"
-    doc.save(nombre_archivo_doc)
-    logger.info(f"El archivo Word '{nombre_archivo_doc}' ha sido creado con éxito.")
-    update_progress(root, progress_bar, status_label, 100, "Convirtiendo el documento Word a PDF...")
-    convert(nombre_archivo_doc)
-    logger.info(f"El archivo PDF '{nombre_archivo_pdf}' ha sido creado con éxito.")
-    nombre_archivo_pdf_sin_pares = f"{prefix}Guias Shein {fecha_actual} {day} medidas pequeñas canguros.pdf"
-    eliminar_hojas_pares(nombre_archivo_pdf, nombre_archivo_pdf_sin_pares, progress_bar, status_label, root)
-    logger.info(f"El archivo PDF '{nombre_archivo_pdf_sin_pares}' ha sido creado con las páginas pares eliminadas.")
-    os.remove(nombre_archivo_pdf)
-    logger.info("El PDF original ha sido eliminado.")
+    nombre_archivo_pdf = os.path.join(output_dir, f"{prefix}Guias Shein {fecha_actual} {day} medidas pequeñas canguros.pdf")
+    done = journal.stage_done("maquetado") if journal else None
+    if done:
+        total_imagenes_inicio, hojas_de_4_imagenes = done["paginas"], done["hojas"]
+    else:
+        if progress:
+            progress(0, "Colocando las guías en hojas de 4...")
+        sheets = []
+        total_imagenes_inicio, hojas_de_4_imagenes = impose_pdf(pdf_path, nombre_archivo_pdf, "canguros", sheets=sheets)
+        logger.info(f"El archivo PDF '{nombre_archivo_pdf}' ha sido creado con éxito.")
+        if journal:
+            journal.complete("maquetado", [nombre_archivo_pdf], paginas=total_imagenes_inicio, hojas=hojas_de_4_imagenes)
+        index_sheets(pdf_path, nombre_archivo_pdf, sheets)
     logger.info(f"Total de imágenes al inicio: {total_imagenes_inicio}")
     logger.info(f"Total de hojas de 4 imágenes: {hojas_de_4_imagenes}")
     logger.info(f"Total de Pedidos procesados: {total_imagenes_inicio / 2}")
-    process_remaining_images_as_large(image_folder, day, pdf_info_text, progress_bar, status_label, root, prefix)
-
-def eliminar_hojas_pares(nombre_archivo_pdf, nombre_archivo_pdf_sin_pares, progress_bar, status_label, root):
-    pdf_document = fitz.open(nombre_archivo_pdf)
-    paginas_eliminadas = 0
-    for index, _ in reversed(list(enumerate(pdf_document))):
-        if (index + 1) % 2 == 0:
-            pdf_document.delete_page(index)
-            paginas_eliminadas += 1
-    pdf_document.save(nombre_archivo_pdf_sin_pares)
-    pdf_document.close()
-    logger.info(f"Se eliminaron {paginas_eliminadas} páginas pares del archivo '{nombre_archivo_pdf_sin_pares}'.")
+    if progress:
+        progress(50, "Colocando las guías de medidas grandes...")
+    large_pdf = process_remaining_images_as_large(pdf_path, day, prefix, output_dir, journal)
+    return total_imagenes_inicio, hojas_de_4_imagenes, [nombre_archivo_pdf, large_pdf]
+
+def process_day(file_path, prefix="", folder_label="Marcas", save_images=False, progress=None, workers=None,
+                output_dir="", day=None, use_cache=True):
+    """
+    Procesa el PDF de un día sin tocar la interfaz, para poder correrlo en
+    un proceso aparte. progress(porcentaje, mensaje) informa el avance y los
+    PDF se escriben en output_dir (por defecto, la carpeta actual).
+    Si el mismo PDF ya se procesó con los mismos parámetros, las salidas se
+    restauran del caché; si una corrida anterior se interrumpió, se reanuda
+    desde su bitácora. Devuelve un resumen del día.
+    """
+    if day is None:
+        day = get_day_from_filename(file_path)
+    params = {"script": "GuiasSheinUi", "prefix": prefix, "day": day, "today": datetime.now().strftime("%d-%m-%Y"),
+              "plantillas": [load_layout(name).spec for name in ("canguros", "medidas_grandes")]}
+    # Tiempos por etapa en JSON lines y un resumen al terminar (metricas)
+    with run(f"{os.path.basename(file_path)} ({day or 'Único'})"):
+        return cached_call(file_path, params, output_dir or os.getcwd(), _process_day,
+                           file_path, prefix, folder_label, save_images, progress, workers, output_dir, day, params,
+                           enabled=use_cache and not save_images)
+
+def _process_day(file_path, prefix, folder_label, save_images, progress, workers, output_dir, day, params):
+    journal = Journal.open(output_dir or os.getcwd(), file_path, params)
+    if save_images:
+        # Las dos salidas PDF son vectoriales; los JPEG solo se rasterizan si se piden
+        output_folder_name = f"{folder_label} - GUIAS SHEIN {datetime.now().strftime('%Y-%m-%d')} - {day} - IMAGENES"
+        output_folder_path = os.path.join(output_dir or os.getcwd(), output_folder_name)
+        if not os.path.exists(output_folder_path):
+            os.makedirs(output_folder_path)
+        min_width = 896
+        min_height = 1538
+        # Incluye la escritura de los JPEG
+        for _ in timed_iter("rasterizar", pdf_to_jpg(file_path, output_folder_path, min_width, min_height, progress,
+                                                     workers), jpg=True):
+            pass
+    total_pages, sheets, outputs = process_images(file_path, day, prefix, progress, output_dir, journal)
+    journal.finish()
+    return {"paginas": total_pages, "pedidos": total_pages // 2, "hojas": sheets, OUTPUTS: outputs}
+
+def process_packed(file_path, prefix="", output_dir="", day=None, use_cache=True):
+    """
+    Todas las guías del día en un solo PDF con la plantilla "empaquetado":
+    cada guía a su medida real (recortada a su contenido) y acomodadas sin
+    cuadrícula fija, para días con paqueterías de varias medidas. Usa el
+    caché como process_day. Devuelve un resumen del día.
+    """
+    if day is None:
+        day = get_day_from_filename(file_path)
+    params = {"script": "GuiasSheinUi", "modo": "empaquetado", "prefix": prefix, "day": day,
+              "today": datetime.now().strftime("%d-%m-%Y"), "plantillas": [load_layout("empaquetado").spec]}
+    with run(f"{os.path.basename(file_path)} ({day or 'Único'}, empaquetado)"):
+        return cached_call(file_path, params, output_dir or os.getcwd(), _process_packed,
+                           file_path, prefix, output_dir, day, enabled=use_cache)
+
+def _process_packed(file_path, prefix, output_dir, day):
+    fecha_actual = datetime.now().strftime("%d-%m-%Y")
+    nombre_archivo_pdf = os.path.join(output_dir, f"{prefix}Guias Shein {fecha_actual} {day} empaquetadas.pdf")
+    sheets = []
+    total_pages, total_sheets = impose_pdf(file_path, nombre_archivo_pdf, "empaquetado", sheets=sheets)
+    logger.info(f"El archivo PDF '{nombre_archivo_pdf}' ha sido creado con éxito.")
+    index_sheets(file_path, nombre_archivo_pdf, sheets)
+    return {"paginas": total_pages, "pedidos": total_pages // 2, "hojas": total_sheets, OUTPUTS: [nombre_archivo_pdf]}
 
 def ask_to_process_another(root):
     response = messagebox.askyesno("Proceso completado", "¿Desea procesar otro pedido?")
@@ -146,35 +193,57 @@ def select_pdf_and_convert():
             messagebox.showerror("Error", "Debe seleccionar tres archivos PDF (Viernes, Sábado y Domingo).")
 
     def process_files(file_paths, is_weekend, prefix="", folder_label="Marcas"):
+        save_images = save_images_var.get()
+        if is_weekend:
+            # Un día por archivo: con nombres repetidos o sin día se rechaza
+            # antes de empezar en lugar de procesar solo uno de ellos
+            try:
+                paths = weekend_paths(file_paths)
+            except ValueError as e:
+                messagebox.showerror("Error", f"No se puede saber el día de cada archivo:\n{e}")
+                return
+        for file_path in file_paths:
+            with fitz.open(file_path) as pdf_document:
+                total_pages = len(pdf_document)
+            day = get_day_from_filename(file_path)
+            pdf_info_text.insert(tk.END, f"{os.path.basename(file_path)} ({day}): {total_pages} páginas, {total_pages // 2} pedidos\n")
+
+        # Los avisos llegan desde el hilo de trabajo: solo se encolan y la
+        # ventana los dibuja en su propio hilo (eventos_ui)
+        def on_progress(progress, message):
+            bus.progress(progress, message=message)
+
+        def on_weekend_progress(day, percent, overall, message):
+            bus.progress(overall, message=f"{day}: {message}")
+
         def run_processing():
             if is_weekend:
-                for file_path in file_paths:
-                    day = get_day_from_filename(file_path)
-                    output_folder_name = f"{folder_label} - GUIAS SHEIN {datetime.now().strftime('%Y-%m-%d')} - {day} - IMAGENES"
-                    output_folder_path = os.path.join(os.getcwd(), output_folder_name)
-                    if not os.path.exists(output_folder_path):
-                        os.makedirs(output_folder_path)
-                    min_width = 896
-                    min_height = 1538
-                    pdf_to_jpg(file_path, output_folder_path, min_width, min_height, day, pdf_info_text, progress_bar, status_label, root)
-                    process_images(output_folder_path, day, pdf_info_text, progress_bar, status_label, root, prefix)
-                ask_to_process_another(root)
+                # Antes de rasterizar se quitan los pedidos que ya venían en un
+                # día anterior (reporte CSV en la carpeta actual)
+                to_process, duplicates = dedupe_weekend(paths, os.getcwd())
+                for day, dups in duplicates.items():
+                    if dups:
+                        bus.log(f"{day}: {len(dups)} pedidos repetidos de días anteriores")
+
+                # Los tres días son independientes: cada uno corre en su propio proceso
+                jobs = {
+                    day: ((file_path, prefix, folder_label, save_images), {"day": day})
+                    for day, file_path in to_process.items()
+                }
+                results = run_days_concurrently(process_day, jobs, on_weekend_progress)
+                for day, summary in results.items():
+                    if "error" in summary:
+                        bus.log(f"{day}: ERROR - {summary['error']}")
+                    else:
+                        bus.log(f"{day}: {summary['pedidos']} pedidos, {summary['hojas']} hojas en {summary['segundos']} s")
+                bus.call(ask_to_process_another, root)
             else:
-                file_path = file_paths[0]
-                day = get_day_from_filename(file_path)
-                output_folder_name = f"{folder_label} - GUIAS SHEIN {datetime.now().strftime('%Y-%m-%d')} - {day} - IMAGENES"
-                output_folder_path = os.path.join(os.getcwd(), output_folder_name)
-                if not os.path.exists(output_folder_path):
-                    os.makedirs(output_folder_path)
-                min_width = 896
-                min_height = 1538
-                pdf_to_jpg(file_path, output_folder_path, min_width, min_height, day, pdf_info_text, progress_bar, status_label, root)
-                process_images(output_folder_path, day, pdf_info_text, progress_bar, status_label, root, prefix)
-                ask_to_process_another(root)
+                process_day(file_paths[0], prefix, folder_label, save_images, progress=on_progress)
+                bus.call(ask_to_process_another, root)
 
         threading.Thread(target=run_processing).start()
 
-    global root, pdf_info_text, progress_bar, status_label
+    global root, pdf_info_text, progress_bar, status_label, save_images_var, bus
     root = tk.Tk()
     root.title("Procesador de Pedidos GUIAS SHEIN")
     root.geometry("700x500")
@@ -199,6 +268,11 @@ def select_pdf_and_convert():
     weekend_ps_button = ttk.Button(root, text="Seleccionar PDFs para el fin de semana (Pure And Simple)", command=process_weekend_ps)
     weekend_ps_button.pack(pady=10, ipadx=10, ipady=5)
 
+    save_images_var = tk.BooleanVar(value=False)
+    save_images_check = tk.Checkbutton(root, text="Guardar también las imágenes JPEG de cada página", variable=save_images_var,
+                                       font=("Segoe UI", 10), bg="#f0f4f8", activebackground="#f0f4f8")
+    save_images_check.pack(pady=(5, 0))
+
     progress_bar = ttk.Progressbar(root, orient='horizontal', length=600, mode='determinate', style='TProgressbar')
     progress_bar.pack(pady=25)
 
@@ -208,50 +282,22 @@ def select_pdf_and_convert():
     pdf_info_text = tk.Text(root, height=10, width=80, font=("Consolas", 10))
     pdf_info_text.pack(pady=10)
 
+    bus = EventBus(root, log_widget=pdf_info_text, progress_bar=progress_bar, status_label=status_label)
+    bus.start()
     root.mainloop()
 
-def process_remaining_images_as_large(image_folder, day, pdf_info_text, progress_bar, status_label, root, prefix=""):
-    doc = Document()
-    for section in doc.sections:
-        section.left_margin = Cm(0.5)
-        section.right_margin = Cm(0.5)
-        section.top_margin = Cm(0.5)
-        section.bottom_margin = Cm(0.5)
-
-    directory = image_folder
-    logger.info(f"Directorio seleccionado: {directory}")
-    image_files = sorted([f for f in os.listdir(directory) if f.endswith('.jpg')])
-    desired_width = Cm(19.26)
-    desired_height = Cm(13.22)
-    logger.info("Agregando las imágenes al documento...")
-    for i in range(0, len(image_files), 2):
-        img_path1 = os.path.join(directory, image_files[i])
-        img1 = Image.open(img_path1)
-        img1 = img1.transpose(Image.ROTATE_270)
-        img1.thumbnail((desired_height, desired_width))
-        img1_temp = "temp_img1.jpg"
-        img1.save(img1_temp)
-        if i + 1 < len(image_files):
-            img_path2 = os.path.join(directory, image_files[i + 1])
-            img2 = Image.open(img_path2)
-            img2 = img2.transpose(Image.ROTATE_270)
-            img2.thumbnail((desired_height, desired_width))
-            img2_temp = "temp_img2.jpg"
-            img2.save(img2_temp)
-            doc.add_picture(img1_temp, width=desired_width, height=desired_height)
-            doc.add_picture(img2_temp, width=desired_width, height=desired_height)
-            os.remove(img2_temp)
-        else:
-            doc.add_picture(img1_temp, width=desired_width, height=desired_height)
-        os.remove(img1_temp)
-
+def process_remaining_images_as_large(pdf_path, day, prefix="", output_dir="", journal=None):
+    # Medidas grandes: 2 guías por hoja, giradas 90° y colocadas como vectores
+    # (plantilla medidas_grandes), sin rasterizar ni pasar por Word
     fecha_actual = datetime.now().strftime("%d-%m-%Y")
-    nombre_archivo_doc = f"{prefix}Guias Shein {fecha_actual} {day} medidas grandes.docx"
-    nombre_archivo_pdf = f"{prefix}Guias Shein {fecha_actual} {day} medidas grandes.pdf"
-    doc.save(nombre_archivo_doc)
-    logger.info(f"El archivo Word '{nombre_archivo_doc}' ha sido creado con éxito.")
-    convert(nombre_archivo_doc)
+    nombre_archivo_pdf = os.path.join(output_dir, f"{prefix}Guias Shein {fecha_actual} {day} medidas grandes.pdf")
+    if journal and journal.stage_done("grandes") is not None:
+        return nombre_archivo_pdf
+    impose_pdf(pdf_path, nombre_archivo_pdf, "medidas_grandes")
     logger.info(f"El archivo PDF '{nombre_archivo_pdf}' ha sido creado con éxito.")
+    if journal:
+        journal.complete("grandes", [nombre_archivo_pdf])
+    return nombre_archivo_pdf
 
 if __name__ == "__main__":
     select_pdf_and_convert()
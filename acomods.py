@@ -10,6 +10,8 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinter.scrolledtext import ScrolledText
 
+from eventos_ui import EventBus
+
 # Extensiones de imagen comunes (ajusta si necesitas)
 IMAGE_EXTS = {
     ".jpg", ".jpeg", ".png", ".webp", ".bmp",
@@ -37,7 +39,10 @@ class App(tk.Tk):
 
         self._build_ui()
         self.worker_thread = None
-        self.stop_flag = False
+        # El hilo de copia solo encola log/progreso; la ventana los dibuja
+        # en su hilo. Detener también pasa por aquí (bus.cancel)
+        self.bus = EventBus(self, log_widget=self.log, progress_bar=self.progress)
+        self.bus.start()
 
     def _build_ui(self):
         pad = {"padx": 10, "pady": 8}
@@ -93,11 +98,8 @@ class App(tk.Tk):
             self.dst_var.set(path)
 
     def log_print(self, msg: str):
-        self.log.configure(state="normal")
-        self.log.insert("end", msg + "\n")
-        self.log.see("end")
-        self.log.configure(state="disabled")
-        self.update_idletasks()
+        # Seguro desde cualquier hilo
+        self.bus.log(msg)
 
     def start_copy(self):
         src = self.src_var.get().strip()
@@ -133,7 +135,7 @@ class App(tk.Tk):
             pass
 
         # Preparar UI
-        self.stop_flag = False
+        self.bus.reset()
         self.run_btn.config(state="disabled")
         self.stop_btn.config(state="normal")
         self.log.configure(state="normal")
@@ -148,7 +150,7 @@ class App(tk.Tk):
         self.after(200, self.check_thread_done)
 
     def stop_copy(self):
-        self.stop_flag = True
+        self.bus.cancel()
         self.log_print("[INFO] Señal de detener enviada. Terminando lo antes posible...")
 
     def check_thread_done(self):
@@ -182,7 +184,7 @@ class App(tk.Tk):
         dst_root.mkdir(parents=True, exist_ok=True)
 
         for src_file in all_paths:
-            if self.stop_flag:
+            if self.bus.cancelled:
                 self.log_print("[CANCELADO] Proceso detenido por el usuario.")
                 break
 
@@ -241,14 +243,11 @@ class App(tk.Tk):
         self.log_print(f"Destino                : {dst_root.resolve()}")
 
     def _set_progress(self, value, maximum):
-        self.progress.config(maximum=maximum, value=value)
-        self.update_idletasks()
+        self.bus.progress(value, maximum)
 
     def _tick_progress(self, processed, total):
-        self.progress.config(value=processed, maximum=max(1, total))
-        # No forzamos update cada vez para no saturar, pero mantenemos fluido:
-        if processed % 20 == 0:
-            self.update_idletasks()
+        # La ventana dibuja solo el último valor de cada intervalo
+        self.bus.progress(processed, max(1, total))
 
 if __name__ == "__main__":
     app = App()
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import shutil
+
+from cache_guias import cache_key, file_sha256
+
+logger = logging.getLogger(__name__)
+
+JOURNAL = "bitacora.json"
+
+
+class Journal:
+    """
+    Bitácora de un trabajo largo: registra las etapas terminadas (maquetado,
+    medidas grandes, separación, DOCX, conversión) para que un trabajo
+    interrumpido se reanude desde la última etapa completa en lugar de
+    empezar de cero. Las maquetaciones vectoriales ya no rasterizan, así que
+    el punto de control es la etapa y no la página.
+
+    Cada artefacto se registra con su tamaño y SHA-256, y se verifica antes
+    de reutilizarlo; si no coincide, la etapa se vuelve a hacer.
+    """
+
+    def __init__(self, work_dir, job):
+        self.work_dir = work_dir
+        self.path = os.path.join(work_dir, JOURNAL)
+        os.makedirs(work_dir, exist_ok=True)
+
+        data = None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if not data or data.get("job") != job:
+            data = {"job": job, "stages": {}}
+        elif data["stages"]:
+            logger.info(f"↻ Reanudando trabajo interrumpido: etapas {list(data['stages'])}")
+        self.data = data
+
+    @classmethod
+    def open(cls, output_dir, pdf_path, params):
+        """Bitácora del PDF con esos parámetros, en una carpeta oculta junto a las salidas."""
+        job = cache_key(pdf_path, params)
+        return cls(os.path.join(output_dir, f".bitacora-{job[:16]}"), job)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _fingerprint(path):
+        return {"size": os.path.getsize(path), "sha256": file_sha256(path)}
+
+    @staticmethod
+    def _verify(path, fingerprint):
+        try:
+            if os.path.getsize(path) != fingerprint["size"]:
+                return False
+        except OSError:
+            return False
+        return file_sha256(path) == fingerprint["sha256"]
+
+    def stage_done(self, stage):
+        """
+        Si la etapa ya se completó y sus artefactos siguen intactos, devuelve
+        la información registrada (dict); si no, None.
+        """
+        entry = self.data["stages"].get(stage)
+        if entry is None:
+            return None
+        for path, fingerprint in entry["artifacts"].items():
+            if not self._verify(path, fingerprint):
+                logger.warning(f"Bitácora: '{os.path.basename(path)}' cambió o falta; se repite la etapa {stage}")
+                del self.data["stages"][stage]
+                self.save()
+                return None
+        # Se marcan como recientes para que cuenten como salidas de esta corrida (caché)
+        for path in entry["artifacts"]:
+            os.utime(path, None)
+        logger.info(f"Bitácora: etapa '{stage}' ya completada, se reutiliza")
+        return entry["info"]
+
+    def complete(self, stage, artifacts=(), **info):
+        """Registra la etapa como terminada junto con sus artefactos."""
+        self.data["stages"][stage] = {
+            "artifacts": {os.path.abspath(p): self._fingerprint(p) for p in artifacts},
+            "info": info,
+        }
+        self.save()
+
+    def finish(self):
+        """El trabajo terminó: se borra la bitácora con sus artefactos intermedios."""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
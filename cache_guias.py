@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+# Carpeta y presupuesto de disco del caché (se pueden cambiar por variable de entorno)
+CACHE_DIR = os.environ.get("GUIAS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "guias-shein"))
+BUDGET_MB = float(os.environ.get("GUIAS_CACHE_MB", "2048"))
+
+MANIFEST = "manifest.json"
+
+# Llave del resumen con las rutas que escribió el trabajo (ver cached_call)
+OUTPUTS = "salidas"
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(pdf_path, params):
+    """
+    Llave del trabajo: SHA-256 del PDF de entrada más los parámetros de
+    maquetación (marca, modo, medidas...), para que el mismo PDF con otra
+    marca o formato no reutilice salidas ajenas.
+    """
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{file_sha256(pdf_path)}\n{payload}".encode("utf-8")).hexdigest()
+
+
+def _read_manifest(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(entry_dir, manifest):
+    tmp = os.path.join(entry_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(entry_dir, MANIFEST))
+
+
+def restore(key, output_folder, cache_dir=None):
+    """
+    Si el trabajo ya está en caché, copia sus salidas a output_folder y
+    devuelve el resumen guardado; si no (o si la entrada está incompleta),
+    devuelve None.
+    """
+    entry_dir = os.path.join(cache_dir or CACHE_DIR, key)
+    manifest = _read_manifest(entry_dir)
+    if manifest is None:
+        return None
+
+    for name, size in manifest["files"].items():
+        cached = os.path.join(entry_dir, name)
+        if not os.path.isfile(cached) or os.path.getsize(cached) != size:
+            logger.warning(f"Entrada de caché incompleta, se descarta: {key[:12]}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+    os.makedirs(output_folder, exist_ok=True)
+    for name in manifest["files"]:
+        shutil.copy2(os.path.join(entry_dir, name), os.path.join(output_folder, name))
+
+    manifest["last_used"] = time.time()
+    _write_manifest(entry_dir, manifest)
+    logger.info(f"♻ Resultado tomado del caché ({key[:12]}): {len(manifest['files'])} archivos → {output_folder}")
+    return dict(manifest.get("summary") or {}, cache=True)
+
+
+def store(key, files, summary=None, cache_dir=None, budget_mb=None):
+    """Guarda las salidas `files` bajo la llave y aplica el presupuesto de disco."""
+    cache_dir = cache_dir or CACHE_DIR
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = entry_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    sizes = {}
+    for path in files:
+        name = os.path.basename(path)
+        shutil.copy2(path, os.path.join(tmp_dir, name))
+        sizes[name] = os.path.getsize(path)
+
+    now = time.time()
+    _write_manifest(tmp_dir, {"files": sizes, "summary": summary, "created": now, "last_used": now})
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+    logger.info(f"Resultado guardado en caché ({key[:12]}): {len(sizes)} archivos")
+    evict(cache_dir, budget_mb)
+
+
+def evict(cache_dir=None, budget_mb=None):
+    """Borra las entradas usadas hace más tiempo hasta quedar dentro del presupuesto."""
+    cache_dir = cache_dir or CACHE_DIR
+    budget_mb = BUDGET_MB if budget_mb is None else budget_mb
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    total = 0
+    for key in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, key)
+        manifest = _read_manifest(entry_dir)
+        if manifest is None:
+            continue
+        size = sum(manifest["files"].values())
+        entries.append((manifest.get("last_used", 0), size, entry_dir))
+        total += size
+
+    budget = budget_mb * 1024 * 1024
+    for _, size, entry_dir in sorted(entries):
+        if total <= budget:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+        logger.info(f"Caché: se eliminó {os.path.basename(entry_dir)[:12]} ({size / 1024 / 1024:.1f} MB)")
+
+
+def cached_call(pdf_path, params, output_folder, fn, *args, enabled=True, **kwargs):
+    """
+    Ejecuta fn(*args, **kwargs) con caché: si el mismo PDF ya se procesó con
+    los mismos parámetros, restaura sus salidas en output_folder sin volver a
+    rasterizar ni maquetar. Si no, corre fn y guarda las salidas que fn
+    reporta en la llave OUTPUTS de su resumen (rutas de los archivos que
+    escribió). Solo esas: en la misma carpeta pueden estar escribiendo otros
+    trabajos a la vez (los días del fin de semana). La llave se quita del
+    resumen que se devuelve.
+    """
+    if not enabled:
+        summary = fn(*args, **kwargs)
+        if summary:
+            summary.pop(OUTPUTS, None)
+        return summary
+
+    key = cache_key(pdf_path, params)
+    summary = restore(key, output_folder)
+    if summary is not None:
+        return summary
+
+    summary = fn(*args, **kwargs)
+    if not summary or "error" in summary:
+        return summary
+
+    outputs = [path for path in summary.pop(OUTPUTS, ()) if os.path.isfile(path)]
+    if outputs:
+        try:
+            store(key, outputs, summary)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar en caché: {e}")
+    return summary
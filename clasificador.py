@@ -0,0 +1,234 @@
+import logging
+import re
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+LABEL = "label"   # guía de paquetería → impresora térmica
+SLIP = "slip"     # packing slip → impresora láser
+BLANK = "blank"   # página sin contenido
+
+# Palabras que aparecen en los packing slips y no en las guías
+SLIP_WORDS = ("packing", "sku", "cantidad", "qty", "quantity", "talla", "size", "color",
+              "precio", "price", "subtotal", "artículo", "articulo", "item")
+# Palabras típicas de las guías de paquetería
+LABEL_WORDS = ("tracking", "guía", "guia", "remitente", "destinatario", "ship to", "shipper",
+               "peso", "weight", "paquetería", "paqueteria", "servicio", "ruta", "cp:")
+
+# Un código de barras se dibuja como muchas barras vectoriales
+BARCODE_DRAWINGS = 40
+
+# Zoom de la miniatura de respaldo (≈ 7 dpi): suficiente para saber si hay tinta
+THUMB_ZOOM = 0.1
+
+# Margen que se deja alrededor del contenido al recortar (≈ 1.5 mm): conserva
+# el antialias de los bordes y algo de zona en blanco junto a los códigos
+TRIM_MARGIN_PT = 4
+
+# Operaciones de get_bboxlog que dejan tinta, además de los dibujos (que se
+# toman de get_cdrawings para saber su color); el texto invisible es "ignore-text"
+INK_OPERATIONS = ("fill-text", "stroke-text", "fill-image", "fill-imgmask", "fill-shade")
+
+
+def _drawing_count(page):
+    get_cdrawings = getattr(page, "get_cdrawings", None)
+    return len(get_cdrawings() if get_cdrawings else page.get_drawings())
+
+
+def _is_blank_thumbnail(page):
+    pix = page.get_pixmap(matrix=fitz.Matrix(THUMB_ZOOM, THUMB_ZOOM), colorspace=fitz.csGRAY, alpha=False)
+    return min(pix.samples_mv) >= 250
+
+
+def _is_white(color):
+    # Gris o RGB con todos los canales en 1; CMYK con todos en 0
+    if len(color) == 4:
+        return max(color) <= 0.05
+    return min(color) >= 0.95
+
+
+def _drawing_ink_rect(drawing):
+    """Rectángulo con tinta de un dibujo, o None si es blanco o transparente (p. ej. el fondo)."""
+    kind = drawing.get("type") or ""
+    fill, color = drawing.get("fill"), drawing.get("color")
+    fills = "f" in kind and fill and not _is_white(fill) and drawing.get("fill_opacity", 1) > 0
+    strokes = "s" in kind and color and not _is_white(color) and drawing.get("stroke_opacity", 1) > 0
+    if not (fills or strokes):
+        return None
+    rect = fitz.Rect(drawing["rect"])
+    if strokes:
+        # Las líneas tienen rectángulo de alto (o ancho) cero: se suma el grosor
+        half = (drawing.get("width") or 1) / 2
+        rect = fitz.Rect(rect.x0 - half, rect.y0 - half, rect.x1 + half, rect.y1 + half)
+    return rect
+
+
+def content_bbox(page, margin=TRIM_MARGIN_PT):
+    """
+    Rectángulo del contenido real de la página (en coordenadas de page.rect,
+    ya con la rotación aplicada) más `margin` puntos, sin rasterizar: une los
+    dibujos que no son blancos (el fondo blanco no cuenta), el texto visible
+    y las imágenes. Si la página no tiene contenido devuelve page.rect.
+    """
+    rects = [r for r in map(_drawing_ink_rect, page.get_cdrawings()) if r is not None]
+    rects.extend(fitz.Rect(r) for kind, r in page.get_bboxlog() if kind in INK_OPERATIONS)
+    if not rects:
+        return fitz.Rect(page.rect)
+
+    bbox = fitz.Rect(min(r.x0 for r in rects), min(r.y0 for r in rects),
+                     max(r.x1 for r in rects), max(r.y1 for r in rects))
+    # get_cdrawings y get_bboxlog dan coordenadas sin rotar
+    if page.rotation:
+        bbox = bbox * page.rotation_matrix
+    bbox = fitz.Rect(bbox.x0 - margin, bbox.y0 - margin, bbox.x1 + margin, bbox.y1 + margin) & page.rect
+    return bbox if not bbox.is_empty else fitz.Rect(page.rect)
+
+
+def classify_page(page, expected=LABEL):
+    """
+    Etiqueta la página como LABEL, SLIP o BLANK sin rasterizarla completa.
+
+    Usa, en orden: el stream de contenido (vacío → en blanco), la capa de
+    texto (palabras clave de slip / guía), el número de dibujos vectoriales
+    (un código de barras son decenas de barras) y, solo si no hay texto ni
+    imágenes, una miniatura de ~7 dpi para confirmar si hay tinta.
+    `expected` decide los empates (lo que tocaría según la alternancia).
+    Las imágenes no cuentan como evidencia: una página escaneada (guía o
+    slip) sin capa de texto se clasifica por alternancia.
+    """
+    if not page.read_contents().strip():
+        return BLANK
+
+    text = page.get_text("text").lower()
+    has_images = bool(page.get_images(full=False))
+    drawings = _drawing_count(page)
+
+    if not text.strip() and not has_images:
+        if drawings == 0 or _is_blank_thumbnail(page):
+            return BLANK
+
+    slip_score = sum(1 for w in SLIP_WORDS if w in text)
+    label_score = sum(1 for w in LABEL_WORDS if w in text)
+    if drawings >= BARCODE_DRAWINGS:
+        label_score += 1
+
+    if slip_score > label_score:
+        return SLIP
+    if label_score > slip_score:
+        return LABEL
+    if has_images and slip_score == label_score == 0:
+        logger.info(f"Página {page.number + 1}: solo imagen, sin texto que la identifique; "
+                    f"se toma como {expected} por alternancia")
+    return expected
+
+
+def classify_pdf(pdf_path):
+    """Clasifica todas las páginas del PDF. Devuelve la lista de etiquetas."""
+    classes = []
+    expected = LABEL
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            tag = classify_page(page, expected)
+            classes.append(tag)
+            if tag != BLANK:
+                expected = SLIP if tag == LABEL else LABEL
+    return classes
+
+
+def pair_pages(classes):
+    """
+    Empareja cada guía con el slip que la sigue.
+
+    Devuelve (pairs, breaks): pairs es una lista de (pagina_guia, pagina_slip)
+    en base 1, con None si falta alguna de las dos; breaks lista los
+    rompimientos de paridad como (pagina, descripción), para que un slip
+    faltante no recorra todos los pares siguientes.
+    """
+    pairs = []
+    breaks = []
+    pending_label = None
+    for pno, tag in enumerate(classes, start=1):
+        if tag == LABEL:
+            if pending_label is not None:
+                pairs.append((pending_label, None))
+                breaks.append((pending_label, "guía sin packing slip"))
+            pending_label = pno
+        elif tag == SLIP:
+            if pending_label is None:
+                pairs.append((None, pno))
+                breaks.append((pno, "packing slip sin guía"))
+            else:
+                pairs.append((pending_label, pno))
+                pending_label = None
+    if pending_label is not None:
+        pairs.append((pending_label, None))
+        breaks.append((pending_label, "guía sin packing slip"))
+    return pairs, breaks
+
+
+def pages_by_class(classes):
+    """Devuelve {LABEL: [...], SLIP: [...], BLANK: [...]} con páginas en base 1."""
+    groups = {LABEL: [], SLIP: [], BLANK: []}
+    for pno, tag in enumerate(classes, start=1):
+        groups[tag].append(pno)
+    return groups
+
+
+def log_classification(classes, prefix=""):
+    """Registra el conteo por tipo y los rompimientos de paridad."""
+    groups = pages_by_class(classes)
+    logger.info(
+        f"{prefix}Clasificación: {len(groups[LABEL])} guías, {len(groups[SLIP])} slips, "
+        f"{len(groups[BLANK])} en blanco"
+    )
+    pairs, breaks = pair_pages(classes)
+    for pno, reason in breaks:
+        logger.warning(f"{prefix}Rompimiento de paridad en página {pno}: {reason}")
+    return groups, pairs
+
+
+# Atributos del artículo en el packing slip, para el orden de surtido
+SKU_RE = re.compile(r"\bsku\s*[:#]?\s*([A-Za-z0-9][A-Za-z0-9_-]{3,})", re.IGNORECASE)
+SIZE_RE = re.compile(r"\b(?:talla|size)\s*[:#]?\s*([A-Za-z0-9./-]+)", re.IGNORECASE)
+COLOR_RE = re.compile(r"\bcolou?r\s*[:#]?\s*([^\n:]+?)\s*(?:\n|$)", re.IGNORECASE)
+SIZE_ORDER = ("XXS", "XS", "S", "M", "L", "XL", "XXL", "2XL", "XXXL", "3XL", "4XL", "5XL")
+
+
+def slip_attributes(text):
+    """Devuelve (sku, talla, color) del texto de un slip; '' si no aparece."""
+    found = []
+    for pattern in (SKU_RE, SIZE_RE, COLOR_RE):
+        match = pattern.search(text)
+        found.append(match.group(1).strip() if match else "")
+    return tuple(found)
+
+
+def _size_key(size):
+    upper = size.upper()
+    if upper in SIZE_ORDER:
+        return (0, SIZE_ORDER.index(upper), "")
+    return (1, 0, upper)
+
+
+def sort_pairs_by_sku(pdf_path, pairs):
+    """
+    Reordena los pares (guía, slip) por SKU, talla y color del slip para que
+    el surtido recorra el almacén en orden. Solo lee la capa de texto de los
+    slips (sin rasterizar). El orden es estable: los pares con el mismo SKU
+    conservan el orden de descarga y los que no tienen SKU van al final.
+    """
+    keys = {}
+    with fitz.open(pdf_path) as doc:
+        for label, slip in pairs:
+            if slip:
+                keys[slip] = slip_attributes(doc[slip - 1].get_text("text"))
+
+    def sort_key(pair):
+        sku, size, color = keys.get(pair[1], ("", "", ""))
+        return (not sku, sku.upper(), _size_key(size), color.upper())
+
+    ordered = sorted(pairs, key=sort_key)
+    skus = len({keys[s][0] for s in keys if keys[s][0]})
+    logger.info(f"Orden de surtido: {len(ordered)} pedidos agrupados en {skus} SKUs")
+    return ordered
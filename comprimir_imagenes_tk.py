@@ -10,6 +10,8 @@ from PIL import Image, ImageOps
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 
+from eventos_ui import EventBus
+
 # ---------------------------------------------
 # Utilidades
 # ---------------------------------------------
@@ -308,6 +310,10 @@ class App(tk.Tk):
         self.total_files = 0
         self.processed = 0
         self._thread = None
+        # El hilo de trabajo solo encola log/progreso; la ventana los dibuja
+        # en su hilo. Cancelar también pasa por aquí (bus.cancel)
+        self.bus = EventBus(self, log_widget=self.log, progress_bar=self.pb)
+        self.bus.start()
 
     def create_widgets(self):
         frm = ttk.Frame(self, padding=10)
@@ -392,13 +398,14 @@ class App(tk.Tk):
         self.log.see("end")
 
         # Lanzar hilo
+        self.bus.reset()
         self._thread = threading.Thread(target=self.worker, daemon=True)
         self._thread.start()
 
     def cancel(self):
         if self._thread and self._thread.is_alive():
+            self.bus.cancel()
             messagebox.showinfo("Cancelación", "Se intentará cancelar. Espera a que termine el archivo actual.")
-        self._thread = None
 
     def worker(self):
         try:
@@ -411,7 +418,8 @@ class App(tk.Tk):
             png_jpg_bg = self.png_bg_var.get()
 
             for p in src.rglob("*"):
-                if self._thread is None:
+                if self.bus.cancelled:
+                    self.bus.log("Proceso cancelado por el usuario.")
                     break
                 if not p.is_file() or not is_image_file(p):
                     continue
@@ -429,16 +437,13 @@ class App(tk.Tk):
                     png_jpg_bg,
                 )
                 self.processed += 1
-                self.pb["value"] = self.processed
+                self.bus.progress(self.processed)
                 out_name = out_path.name if out_path else "—"
-                self.log.insert("end", f"[{self.processed}/{self.total_files}] {rel} → {out_name} | {msg}\n")
-                self.log.see("end")
-                self.update_idletasks()
+                self.bus.log(f"[{self.processed}/{self.total_files}] {rel} → {out_name} | {msg}")
 
-            self.log.insert("end", "Proceso terminado.\n")
-            self.log.see("end")
+            self.bus.log("Proceso terminado.")
         except Exception as e:
-            messagebox.showerror("Error", str(e))
+            self.bus.call(messagebox.showerror, "Error", str(e))
 
 
 # ---------------------------------------------
@@ -1,36 +1,16 @@
-import fitz
-from PIL import Image
 import tkinter as tk
 from tkinter import filedialog
 import os
 from datetime import datetime
+from rasterizador import render_pages
 
 def pdf_to_jpg(pdf_path, output_folder, min_width, min_height):
-    # Abre el archivo PDF
-    pdf_document = fitz.open(pdf_path)
-    
-    # Itera sobre cada página del PDF
-    for page_number in range(len(pdf_document)):
-        # Obtiene la página
-        page = pdf_document.load_page(page_number)
-        
-        # Convierte la página en imagen
-        pix = page.get_pixmap()
-        
-        # Ajusta el tamaño de la imagen si es menor que el mínimo especificado
-        if pix.width < min_width or pix.height < min_height:
-            scale_factor = max(min_width / pix.width, min_height / pix.height)
-            pix = page.get_pixmap(matrix=fitz.Matrix(scale_factor, scale_factor))
-        
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        
+    # Rasteriza las páginas en paralelo y las recibe en orden
+    for page_number, img in render_pages(pdf_path, min_size=(min_width, min_height)):
         # Guarda la imagen como JPEG numerado
         output_path = f"{output_folder}/{page_number + 1:04d}.jpg"  # Formato con ceros iniciales
         img.save(output_path, quality=100)  # Ajusta la calidad al 100%
         print(f"Guardado {output_path}")
-    
-    # Cierra el archivo PDF
-    pdf_document.close()
 
 def select_pdf_and_convert():
     # Abre una ventana de diálogo para seleccionar el archivo PDF
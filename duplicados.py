@@ -0,0 +1,192 @@
+"""
+Script: duplicados.py
+Descripción: Detecta pedidos repetidos entre los PDF del fin de semana
+             (viernes, sábado y domingo) por su número de guía y quita o
+             marca los pares guía/slip repetidos antes de rasterizar nada.
+             Deja un reporte CSV con lo que se encontró.
+Uso:
+  python duplicados.py viernes.pdf sabado.pdf domingo.pdf
+  python duplicados.py --marcar --salida reportes viernes.pdf sabado.pdf domingo.pdf
+Notas:
+  - Los PDF se revisan en el orden dado: se conserva la primera vez que
+    aparece cada guía (la del día más temprano) y se quitan las siguientes.
+  - Solo se lee la capa de texto (clasificador + patrones de indice_guias).
+"""
+
+import argparse
+import csv
+import logging
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+from clasificador import classify_pdf, pair_pages
+from imposicion import extract_pages
+from indice_guias import TRACKING_PATTERNS
+from metricas import stage
+
+logger = logging.getLogger(__name__)
+
+# Qué hacer con los pedidos repetidos: "quitar" (por defecto), "marcar" (solo
+# el reporte) o "no" (no se revisa)
+REMOVE = "quitar"
+FLAG = "marcar"
+SKIP = "no"
+DUPLICATE_ACTION = os.environ.get("GUIAS_DUPLICADOS", REMOVE)
+
+# Un par guía/slip repetido y dónde apareció primero (páginas en base 1)
+Duplicate = namedtuple("Duplicate", "day label_page slip_page tracking first_day first_page")
+
+
+def tracking_numbers(text):
+    """Números de guía de la página, sin repetir y en orden de aparición."""
+    found = {}
+    for pattern in TRACKING_PATTERNS:
+        for match in pattern.findall(text):
+            found.setdefault(match, None)
+    return tuple(found)
+
+
+def pair_trackings(pdf_path):
+    """
+    Empareja guías y slips del PDF (clasificador) y devuelve una lista de
+    (pagina_guia, pagina_slip, guías). Las guías salen de la página de la
+    guía; si no tiene capa de texto, del slip.
+    """
+    pairs, _ = pair_pages(classify_pdf(pdf_path))
+    result = []
+    with fitz.open(pdf_path) as doc:
+        for label, slip in pairs:
+            codes = ()
+            for pno in (label, slip):
+                if pno and not codes:
+                    codes = tracking_numbers(doc[pno - 1].get_text("text"))
+            result.append((label, slip, codes))
+    return result
+
+
+def find_duplicates(paths):
+    """
+    Revisa los PDF de `paths` ({día: pdf}, en orden) con un solo conjunto de
+    guías ya vistas. Un par cuya guía ya apareció (en un día anterior o antes
+    en el mismo día) es un duplicado. Devuelve {día: [Duplicate]}.
+    """
+    seen = {}
+    duplicates = {}
+    with stage("duplicados") as st:
+        for day, pdf_path in paths.items():
+            duplicates[day] = []
+            without_code = 0
+            for label, slip, codes in pair_trackings(pdf_path):
+                st.pages += (label is not None) + (slip is not None)
+                if not codes:
+                    without_code += 1
+                    continue
+                first = next((seen[code] for code in codes if code in seen), None)
+                if first:
+                    duplicates[day].append(Duplicate(day, label, slip, codes[0], *first))
+                    continue
+                for code in codes:
+                    seen[code] = (day, label or slip)
+            if without_code:
+                logger.warning(f"[{day}] {without_code} pedidos sin número de guía reconocible; no se revisaron")
+    return duplicates
+
+
+def remove_duplicates(pdf_path, duplicates, output_path):
+    """
+    Escribe en output_path el PDF sin las páginas de los pares repetidos.
+    Devuelve output_path, o None si no quedó ninguna página.
+    """
+    drop = {pno for dup in duplicates for pno in (dup.label_page, dup.slip_page) if pno}
+    with fitz.open(pdf_path) as doc:
+        keep = [pno for pno in range(1, doc.page_count + 1) if pno not in drop]
+    if not keep:
+        return None
+    with stage("separar", pages=len(keep), outputs=[output_path]):
+        extract_pages(pdf_path, {output_path: keep})
+    return output_path
+
+
+def write_report(duplicates, report_path, action):
+    """Reporte CSV: una fila por par repetido con dónde apareció primero."""
+    with open(report_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["dia", "pagina_guia", "pagina_slip", "guia", "primera_vez_dia", "primera_vez_pagina",
+                         "accion"])
+        for day_duplicates in duplicates.values():
+            for dup in day_duplicates:
+                writer.writerow([dup.day, dup.label_page or "", dup.slip_page or "", dup.tracking, dup.first_day,
+                                 dup.first_page, "quitado" if action == REMOVE else "marcado"])
+
+
+def dedupe_weekend(paths, output_dir, action=None):
+    """
+    Revisa los PDF del fin de semana ({día: pdf}, del día más temprano al más
+    tardío) antes de procesarlos.
+
+    Con action="quitar" escribe en output_dir una copia "<nombre> sin
+    duplicados.pdf" de cada día que tenga repetidos (el nombre conserva el
+    día) y con "marcar" solo los reporta; en ambos casos deja el reporte
+    "duplicados <fecha>.csv" en output_dir. Devuelve ({día: pdf a procesar},
+    {día: [Duplicate]}); un día que se queda sin páginas ya no aparece en
+    el primero.
+    """
+    action = action or DUPLICATE_ACTION
+    if action == SKIP:
+        return dict(paths), {}
+
+    duplicates = find_duplicates(paths)
+    total = sum(len(dups) for dups in duplicates.values())
+    if not total:
+        logger.info("Duplicados: ningún pedido se repite entre los días")
+        return dict(paths), duplicates
+
+    for day, dups in duplicates.items():
+        for dup in dups:
+            logger.warning(f"[{day}] Guía {dup.tracking} (páginas {dup.label_page}/{dup.slip_page}) "
+                           f"ya venía en {dup.first_day}, página {dup.first_page}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, f"duplicados {datetime.now().strftime('%d-%m-%Y')}.csv")
+    write_report(duplicates, report_path, action)
+
+    to_process = dict(paths)
+    if action == REMOVE:
+        for day, dups in duplicates.items():
+            if not dups:
+                continue
+            stem = os.path.splitext(os.path.basename(paths[day]))[0]
+            cleaned = remove_duplicates(paths[day], dups, os.path.join(output_dir, f"{stem} sin duplicados.pdf"))
+            if cleaned:
+                to_process[day] = cleaned
+            else:
+                logger.warning(f"[{day}] Todos sus pedidos ya venían en otro día; no se procesa")
+                del to_process[day]
+
+    verb = "quitados" if action == REMOVE else "marcados"
+    logger.info(f"Duplicados: {total} pedidos repetidos {verb}; reporte en {report_path}")
+    return to_process, duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca pedidos repetidos entre los PDF del fin de semana.")
+    parser.add_argument("pdfs", nargs="+", metavar="PDF", help="PDF en orden (viernes, sábado, domingo)")
+    parser.add_argument("--marcar", action="store_true", help="Solo reportar, sin escribir copias sin duplicados")
+    parser.add_argument("--salida", default=".", help="Carpeta del reporte y de las copias (por defecto la actual)")
+    args = parser.parse_args(argv)
+
+    # La llave es el nombre del archivo: en la línea de comandos no hay día
+    paths = {os.path.basename(pdf): pdf for pdf in args.pdfs}
+    to_process, duplicates = dedupe_weekend(paths, args.salida, FLAG if args.marcar else REMOVE)
+    for day, pdf in to_process.items():
+        print(f"{day}: {len(duplicates.get(day, []))} repetidos → {pdf}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
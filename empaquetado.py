@@ -0,0 +1,147 @@
+"""
+Acomodo de rectángulos de distintos tamaños en hojas (bin packing).
+
+Algoritmo skyline "abajo-izquierda": cada hoja guarda su contorno superior
+ocupado (el skyline) como una lista de segmentos y cada rectángulo se pone
+donde su borde inferior queda más arriba en la hoja, o sea, lo más pegado
+posible a lo ya colocado. Se prueba también girado 90° y solo se mantienen
+abiertas las últimas OPEN_SHEETS hojas, así el costo por etiqueta no crece
+con el número de hojas (2,000 etiquetas en décimas de segundo).
+
+Todas las medidas van en las mismas unidades (puntos PDF en imposicion). La
+separación `gap` es el mínimo entre dos rectángulos para el corte con
+guillotina; no se deja contra el borde del área útil.
+"""
+
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Hojas en las que se sigue buscando lugar; las anteriores se dan por llenas
+OPEN_SHEETS = 4
+
+# Dónde quedó cada rectángulo: hoja (base 0), esquina superior izquierda,
+# medidas ya giradas y si se giró 90°
+Placement = namedtuple("Placement", "sheet x y width height rotated")
+
+
+class _Sheet:
+    """Skyline de una hoja: segmentos [x, y, ancho] ordenados por x."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.skyline = [[0.0, 0.0, width]]
+
+    def find(self, w, h):
+        """(y_final, x, y) del mejor lugar para un rectángulo w x h, o None."""
+        best = None
+        skyline = self.skyline
+        for i, (x, _, _) in enumerate(skyline):
+            if x + w > self.width + 1e-6:
+                break
+            # El rectángulo descansa sobre el segmento más alto que cubre
+            y = 0.0
+            end = x + w
+            j = i
+            while j < len(skyline) and skyline[j][0] < end - 1e-6:
+                y = max(y, skyline[j][1])
+                j += 1
+            if y + h <= self.height + 1e-6 and (best is None or (y + h, x) < best[:2]):
+                best = (y + h, x, y)
+        return best
+
+    def add(self, x, y, w, h):
+        end = x + w
+        updated = []
+        for sx, sy, sw in self.skyline:
+            se = sx + sw
+            if se <= x + 1e-6 or sx >= end - 1e-6:
+                updated.append([sx, sy, sw])
+                continue
+            # Lo que queda del segmento a los lados del rectángulo
+            if sx < x:
+                updated.append([sx, sy, x - sx])
+            if se > end:
+                updated.append([end, sy, se - end])
+        updated.append([x, y + h, w])
+        updated.sort()
+        # Segmentos contiguos a la misma altura se unen
+        merged = [updated[0]]
+        for seg in updated[1:]:
+            last = merged[-1]
+            if abs(last[1] - seg[1]) < 1e-6:
+                last[2] += seg[2]
+            else:
+                merged.append(seg)
+        self.skyline = merged
+
+
+def pack(sizes, width, height, gap=0.0, rotate=True, sort=None, open_sheets=OPEN_SHEETS):
+    """
+    Acomoda los rectángulos `sizes` [(ancho, alto)] en hojas de width x height
+    dejando al menos `gap` entre ellos. Con rotate=True cada uno se puede
+    girar 90° si así queda más arriba.
+
+    sort=True los acomoda de más alto a más bajo (estable) y sort=False en el
+    orden de llegada, que conserva el orden de surtido; con sort=None (por
+    defecto) se prueban los dos y se queda el de menos hojas (el de llegada
+    si empatan). Según la mezcla de tamaños gana uno u otro.
+
+    Devuelve una Placement por rectángulo, en el orden de `sizes`. Un
+    rectángulo que no cabe en una hoja vacía ni girado lanza ValueError.
+    """
+    if sort is None:
+        arrival = pack(sizes, width, height, gap, rotate, False, open_sheets)
+        by_height = pack(sizes, width, height, gap, rotate, True, open_sheets)
+        return by_height if sheet_count(by_height) < sheet_count(arrival) else arrival
+
+    # Con la separación sumada a cada rectángulo (y al área, para que el
+    # último de cada fila y columna no la necesite contra el borde)
+    area_w, area_h = width + gap, height + gap
+    order = range(len(sizes))
+    if sort:
+        order = sorted(order, key=lambda i: -max(sizes[i]) if rotate else -sizes[i][1])
+
+    sheets = []
+    placements = [None] * len(sizes)
+    for i in order:
+        w, h = sizes[i]
+        options = [(w, h, False)]
+        if rotate and abs(w - h) > 1e-6:
+            options.append((h, w, True))
+        if not any(ow <= width + 1e-6 and oh <= height + 1e-6 for ow, oh, _ in options):
+            raise ValueError(f"Un rectángulo de {w:.1f} x {h:.1f} no cabe en el área de {width:.1f} x {height:.1f}")
+
+        first_open = max(0, len(sheets) - open_sheets)
+        placed = None
+        for sheet_no in range(first_open, len(sheets)):
+            placed = _best_fit(sheets[sheet_no], options, gap)
+            if placed:
+                placed = (sheet_no,) + placed
+                break
+        if placed is None:
+            sheets.append(_Sheet(area_w, area_h))
+            placed = (len(sheets) - 1,) + _best_fit(sheets[-1], options, gap)
+
+        sheet_no, x, y, ow, oh, rotated = placed
+        sheets[sheet_no].add(x, y, ow + gap, oh + gap)
+        placements[i] = Placement(sheet_no, x, y, ow, oh, rotated)
+    return placements
+
+
+def sheet_count(placements):
+    return max((p.sheet for p in placements), default=-1) + 1
+
+
+def _best_fit(sheet, options, gap):
+    best = None
+    for w, h, rotated in options:
+        found = sheet.find(w + gap, h + gap)
+        if found and (best is None or found[:2] < best[0][:2]):
+            best = (found, w, h, rotated)
+    if best is None:
+        return None
+    (_, x, y), w, h, rotated = best
+    return x, y, w, h, rotated
@@ -0,0 +1,147 @@
+"""
+Canal de eventos entre los hilos de trabajo y la interfaz Tk.
+
+Tk no es seguro entre hilos: los hilos de trabajo no deben tocar widgets ni
+llamar a update_idletasks(). Con EventBus el hilo solo encola eventos (log,
+progreso, estado, llamadas) y el hilo de Tk los aplica cada INTERVAL_MS con
+after(): del progreso y del estado solo se dibuja el último valor, y el log
+se inserta en bloque y se recorta a MAX_LOG_LINES líneas. La cancelación
+pasa por el mismo objeto: la interfaz llama a cancel() y el hilo consulta
+`cancelled` entre archivo y archivo.
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto el hilo de Tk aplica los eventos pendientes
+INTERVAL_MS = int(os.environ.get("GUIAS_UI_INTERVALO", "100"))
+# Líneas que se conservan en el log de la ventana (las más viejas se borran)
+MAX_LOG_LINES = int(os.environ.get("GUIAS_UI_LINEAS", "2000"))
+
+_LOG, _PROGRESS, _STATUS, _CALL = "log", "progreso", "estado", "llamada"
+
+
+class EventBus:
+    """
+    Une un hilo de trabajo con los widgets de una ventana. Los métodos log,
+    progress, status, call y cancel se pueden llamar desde cualquier hilo;
+    start y stop, solo desde el de Tk.
+    """
+
+    def __init__(self, root, log_widget=None, progress_bar=None, status_label=None,
+                 interval_ms=None, max_log_lines=None):
+        self.root = root
+        self.log_widget = log_widget
+        self.progress_bar = progress_bar
+        self.status_label = status_label
+        self.interval_ms = interval_ms or INTERVAL_MS
+        self.max_log_lines = max_log_lines or MAX_LOG_LINES
+        self._events = queue.SimpleQueue()
+        self._cancel = threading.Event()
+        self._after_id = None
+
+    # --- Lado de los hilos de trabajo ---
+
+    def log(self, message):
+        self._events.put((_LOG, str(message)))
+
+    def progress(self, value, maximum=None, message=None):
+        self._events.put((_PROGRESS, (value, maximum)))
+        if message is not None:
+            self.status(message)
+
+    def status(self, message):
+        self._events.put((_STATUS, message))
+
+    def call(self, fn, *args, **kwargs):
+        """Ejecuta fn en el hilo de Tk (messagebox, reiniciar la ventana...)."""
+        self._events.put((_CALL, (fn, args, kwargs)))
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def reset(self):
+        """Prepara una corrida nueva: quita la cancelación anterior."""
+        self._cancel.clear()
+
+    # --- Lado del hilo de Tk ---
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self._drain(reschedule=False)
+
+    def _drain(self, reschedule=True):
+        lines = deque(maxlen=self.max_log_lines)
+        dropped = 0
+        progress = status = None
+        try:
+            while True:
+                try:
+                    kind, payload = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == _LOG:
+                    if len(lines) == lines.maxlen:
+                        dropped += 1
+                    lines.append(payload)
+                elif kind == _PROGRESS:
+                    progress = payload
+                elif kind == _STATUS:
+                    status = payload
+                elif kind == _CALL:
+                    # Lo anterior se dibuja antes de la llamada (p. ej. el resumen antes del messagebox)
+                    self._apply(lines, dropped, progress, status)
+                    lines.clear()
+                    dropped, progress, status = 0, None, None
+                    fn, args, kwargs = payload
+                    fn(*args, **kwargs)
+            self._apply(lines, dropped, progress, status)
+        except Exception:
+            logger.exception("Error al actualizar la interfaz")
+        finally:
+            if reschedule:
+                self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def _apply(self, lines, dropped, progress, status):
+        if progress is not None and self.progress_bar is not None:
+            value, maximum = progress
+            if maximum is not None:
+                self.progress_bar.config(maximum=maximum, value=value)
+            else:
+                self.progress_bar.config(value=value)
+        if status is not None and self.status_label is not None:
+            self.status_label.config(text=status)
+        if (lines or dropped) and self.log_widget is not None:
+            text = "\n".join(lines) + "\n"
+            if dropped:
+                text = f"… ({dropped} líneas omitidas)\n" + text
+            self._append_log(text)
+
+    def _append_log(self, text):
+        widget = self.log_widget
+        state = str(widget.cget("state"))
+        if state == "disabled":
+            widget.configure(state="normal")
+        widget.insert("end", text)
+        # Log acotado: se borran las líneas más viejas
+        line_count = int(widget.index("end-1c").split(".")[0])
+        if line_count > self.max_log_lines:
+            widget.delete("1.0", f"{line_count - self.max_log_lines + 1}.0")
+        widget.see("end")
+        if state == "disabled":
+            widget.configure(state="disabled")
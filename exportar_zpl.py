@@ -0,0 +1,117 @@
+import logging
+
+from PIL import Image, ImageOps
+
+from metricas import stage, timed_iter
+from rasterizador import render_pages
+
+logger = logging.getLogger(__name__)
+
+# Resolución nativa de las impresoras térmicas (203 o 300 dpi)
+THERMAL_DPI = 203
+
+# Rollo de etiquetas 4 x 6 in
+LABEL_SIZE_CM = (10.16, 15.24)
+
+FORMATS = ("zpl", "epl")
+
+
+def label_bitmap(img):
+    """
+    Convierte la página renderizada en un bitmap de 1 bit con tramado
+    Floyd-Steinberg, listo para la impresora: 1 = punto negro.
+    El ancho se completa a múltiplo de 8 con blanco para que el relleno
+    de cada renglón nunca imprima puntos.
+    """
+    gray = img.convert("L")
+    width = (gray.width + 7) // 8 * 8
+    if width != gray.width:
+        padded = Image.new("L", (width, gray.height), 255)
+        padded.paste(gray, (0, 0))
+        gray = padded
+    # Invertido: en "1" de PIL un bit en 1 es blanco, en ZPL es un punto negro
+    return ImageOps.invert(gray).convert("1")
+
+
+def _zpl_repeat(char, count):
+    """Compresión ASCII de ZPL: G..Y = 1..19, g..z = 20..400 repeticiones."""
+    out = []
+    while count > 0:
+        chunk = min(count, 419)
+        count -= chunk
+        prefix = ""
+        if chunk >= 20:
+            prefix += chr(ord("g") + chunk // 20 - 1)
+            chunk %= 20
+        if chunk > 1 or (prefix and chunk == 1):
+            prefix += chr(ord("G") + chunk - 1)
+        out.append(prefix + char)
+    return "".join(out)
+
+
+def _zpl_row(hex_row):
+    """Comprime un renglón hexadecimal: ',' rellena con ceros hasta el final."""
+    stripped = hex_row.rstrip("0")
+    if not stripped:
+        return ","
+    out = []
+    i = 0
+    while i < len(stripped):
+        j = i
+        while j < len(stripped) and stripped[j] == stripped[i]:
+            j += 1
+        out.append(_zpl_repeat(stripped[i], j - i))
+        i = j
+    if len(stripped) < len(hex_row):
+        out.append(",")
+    return "".join(out)
+
+
+def to_zpl(bitmap):
+    """Genera un trabajo ZPL (^XA ... ^XZ) con la etiqueta como ^GFA comprimido."""
+    bytes_per_row = bitmap.width // 8
+    data = bitmap.tobytes()
+    total = len(data)
+    rows = []
+    previous = None
+    for y in range(bitmap.height):
+        row = data[y * bytes_per_row:(y + 1) * bytes_per_row]
+        # ':' repite el renglón anterior
+        rows.append(":" if row == previous else _zpl_row(row.hex().upper()))
+        previous = row
+    return f"^XA^PW{bitmap.width}^LL{bitmap.height}^FO0,0^GFA,{total},{total},{bytes_per_row},{''.join(rows)}^FS^XZ\n"
+
+
+def to_epl(bitmap):
+    """Genera un trabajo EPL2 con la etiqueta como GW (binario, 0 = punto negro)."""
+    bytes_per_row = bitmap.width // 8
+    data = bytes(b ^ 0xFF for b in bitmap.tobytes())
+    header = f"\nN\nq{bitmap.width}\nQ{bitmap.height},24\nGW0,0,{bytes_per_row},{bitmap.height},"
+    return header.encode("ascii") + data + b"\nP1\n"
+
+
+def export_labels(pdf_path, pages, output_path, fmt="zpl", dpi=THERMAL_DPI, label_size_cm=LABEL_SIZE_CM, workers=None):
+    """
+    Renderiza las páginas `pages` (base 1) a la resolución nativa de la
+    impresora térmica y las escribe en `output_path` como un solo archivo
+    ZPL o EPL, listo para enviarse en crudo a la impresora.
+    Devuelve el número de etiquetas escritas.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt} (use {', '.join(FORMATS)})")
+
+    count = 0
+    render = timed_iter("rasterizar", render_pages(pdf_path, pages=[p - 1 for p in pages], cell_cm=label_size_cm,
+                                                   dpi=dpi, mode="L", workers=workers))
+    with stage("guardar", outputs=[output_path], formato=fmt) as st, open(output_path, "wb") as f:
+        for _, img in render:
+            bitmap = label_bitmap(img)
+            if fmt == "zpl":
+                f.write(to_zpl(bitmap).encode("ascii"))
+            else:
+                f.write(to_epl(bitmap))
+            count += 1
+        st.pages = count
+
+    logger.info(f"✅ {fmt.upper()} guardado en: {output_path} ({count} etiquetas a {dpi} dpi)")
+    return count
@@ -0,0 +1,290 @@
+"""
+Script: guias_cli.py
+Descripción: Procesa los PDF de guías sin ventanas (marca, modo y día por argumentos)
+             y vigila una carpeta de entrada para procesar cada PDF en cuanto llega.
+Uso:
+  python guias_cli.py procesar --marca "Pure and Simple" --modo laser archivo.pdf
+  python guias_cli.py procesar --marca TikTok --termica zpl --dia Viernes viernes.pdf
+  python guias_cli.py vigilar --entrada ~/Guias/entrada --salida ~/Guias/salida
+  python guias_cli.py cola -t "Marcas y Licencias" marcas.pdf -t "Pure and Simple" ps.pdf canguros \
+                           -t TikTok tiktok.pdf laser 5
+Notas:
+  - modo "laser": guías → impresora térmica, slips → láser (split_and_compile).
+  - modo "canguros": 4 por hoja + medidas grandes (GuiasSheinUi).
+  - modo "empaquetado": guías de varias medidas a tamaño real, acomodadas sin
+    cuadrícula fija (plantillas/empaquetado.json).
+  - En la carpeta de entrada, un PDF dentro de una subcarpeta con el nombre de
+    una marca (p. ej. entrada/TikTok/) se procesa con esa marca.
+  - "cola" corre varios trabajos (MARCA PDF [MODO [PRIORIDAD]]) a la vez, cada
+    uno en su proceso, repartiendo los núcleos; "vigilar" también manda por la
+    cola los PDF que encuentra en cada revisión. Si dos de esos PDF son de la
+    misma marca y día, cada uno deja sus salidas en una subcarpeta con su nombre.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import GuiasSheinUi
+import cache_guias
+import rasterizador
+import split_and_compile
+from lotes import JobQueue, log_job_status
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+BRANDS = ("Marcas y Licencias", "Pure and Simple", "TikTok")
+MODES = ("laser", "canguros", "empaquetado")
+THERMAL_FORMATS = ("pdf", "zpl", "epl")
+
+PROCESSED_DIR = "procesados"
+ERROR_DIR = "errores"
+
+
+def default_output():
+    return os.path.join(os.path.expanduser("~"), "Desktop")
+
+
+def output_folder_for(base, brand, day="", subfolder=""):
+    """Carpeta de salida por marca y fecha (y día y subcarpeta, si se indicaron)."""
+    today = datetime.now().strftime("%d-%m-%Y")
+    folder = os.path.join(base, brand, today, *(part for part in (day, subfolder) if part))
+    os.makedirs(folder, exist_ok=True)
+    return folder, today
+
+
+def process_file(pdf_path, brand, mode, output_base, day=None, thermal_format="pdf", save_images=False, use_cache=True,
+                 sort_by_sku=False, subfolder=""):
+    """
+    Procesa un PDF con la lógica de siempre, sin diálogos. `subfolder` separa
+    sus salidas de las de otro PDF de la misma marca y día (ver run_queue).
+    Devuelve el resumen; lanza RuntimeError si el procesamiento falló.
+    """
+    if day is None:
+        day = GuiasSheinUi.get_day_from_filename(pdf_path)
+    output_folder, today = output_folder_for(output_base, brand, day, subfolder)
+    logger.info(f"▶ {os.path.basename(pdf_path)}: marca={brand}, modo={mode}, día={day or '-'} → {output_folder}")
+
+    prefix = "PS " if brand == "Pure and Simple" else ""
+    if mode == "laser":
+        summary = split_and_compile.process_pdf(pdf_path, brand, output_folder, today, save_images, thermal_format,
+                                                use_cache=use_cache, sort_by_sku=sort_by_sku)
+    elif mode == "empaquetado":
+        summary = GuiasSheinUi.process_packed(pdf_path, prefix, output_dir=output_folder, day=day, use_cache=use_cache)
+    else:
+        summary = GuiasSheinUi.process_day(pdf_path, prefix, brand, save_images, output_dir=output_folder, day=day,
+                                           use_cache=use_cache)
+
+    if summary and "error" in summary:
+        raise RuntimeError(summary["error"])
+    logger.info(f"✅ {os.path.basename(pdf_path)}: {summary}")
+    return summary
+
+
+def _brand_for(path, inbox, default_brand):
+    parent = os.path.basename(os.path.dirname(path))
+    if os.path.dirname(path) != inbox and parent in BRANDS:
+        return parent
+    return default_brand
+
+
+def _pending_pdfs(inbox):
+    found = []
+    for entry in sorted(os.listdir(inbox)):
+        full = os.path.join(inbox, entry)
+        if entry.lower().endswith(".pdf") and os.path.isfile(full):
+            found.append(full)
+        elif entry in BRANDS and os.path.isdir(full):
+            found.extend(
+                os.path.join(full, name) for name in sorted(os.listdir(full))
+                if name.lower().endswith(".pdf")
+            )
+    return found
+
+
+def _move(path, inbox, folder):
+    dest_dir = os.path.join(inbox, folder)
+    os.makedirs(dest_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    dest = os.path.join(dest_dir, f"{stamp} {os.path.basename(path)}")
+    shutil.move(path, dest)
+    return dest
+
+
+def job_name(pdf_path, brand, mode):
+    return f"{brand} · {os.path.basename(pdf_path)} ({mode})"
+
+
+def apply_settings(cache_mb=None, window=None):
+    """
+    Aplica --cache-mb y --ventana a los módulos. Corre en el proceso principal
+    y al arrancar cada proceso de la cola, que con spawn reimporta los módulos
+    con los valores por defecto.
+    """
+    if cache_mb is not None:
+        cache_guias.BUDGET_MB = cache_mb
+    if window is not None:
+        rasterizador.WINDOW_PER_WORKER = window
+
+
+def run_queue(jobs, output_base, thermal_format="pdf", save_images=False, use_cache=True, sort_by_sku=False,
+              max_jobs=None, cpus=None, memory_mb=None, settings=()):
+    """
+    Corre a la vez los trabajos [(pdf, marca, modo, prioridad)] con process_file,
+    cada uno en su proceso, y devuelve los lotes.Job en el mismo orden.
+    settings son los argumentos de apply_settings para esos procesos.
+    """
+    queue = JobQueue(process_file, cpus=cpus, max_jobs=max_jobs, memory_mb=memory_mb, on_status=log_job_status,
+                     initializer=apply_settings, initargs=tuple(settings))
+    # Dos PDF de la misma marca y día irían a la misma carpeta con los mismos
+    # nombres de archivo y, al correr a la vez, se pisarían: cada uno va a una
+    # subcarpeta con el nombre de su PDF
+    folders = Counter((brand, GuiasSheinUi.get_day_from_filename(pdf_path)) for pdf_path, brand, _, _ in jobs)
+    for pdf_path, brand, mode, priority in jobs:
+        shared = folders[brand, GuiasSheinUi.get_day_from_filename(pdf_path)] > 1
+        queue.submit(job_name(pdf_path, brand, mode), (pdf_path, brand, mode, output_base),
+                     {"thermal_format": thermal_format, "save_images": save_images, "use_cache": use_cache,
+                      "sort_by_sku": sort_by_sku,
+                      "subfolder": os.path.splitext(os.path.basename(pdf_path))[0] if shared else ""}, priority)
+    return queue.run()
+
+
+def watch(inbox, output_base, brand, mode, thermal_format="pdf", save_images=False, interval=2.0, once=False,
+          use_cache=True, sort_by_sku=False, max_jobs=None, cpus=None, memory_mb=None, settings=()):
+    """
+    Vigila `inbox` y procesa cada PDF en cuanto termina de copiarse (su tamaño
+    no cambia entre dos revisiones). Los PDF listos en la misma revisión (p. ej.
+    uno por marca) corren a la vez por la cola de trabajos. Los procesados pasan
+    a inbox/procesados y los que fallan a inbox/errores, para no volver a tomarlos.
+    """
+    inbox = os.path.abspath(inbox)
+    os.makedirs(inbox, exist_ok=True)
+    logger.info(f"Vigilando {inbox} cada {interval} s (Ctrl+C para salir)")
+    sizes = {}
+
+    while True:
+        ready = []
+        for path in _pending_pdfs(inbox):
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if sizes.get(path) != size and not once:
+                # Primera vez que lo vemos o sigue creciendo: esperar a la siguiente vuelta
+                sizes[path] = size
+                continue
+            sizes.pop(path, None)
+            ready.append((path, _brand_for(path, inbox, brand), mode, 0))
+
+        if ready:
+            jobs = run_queue(ready, output_base, thermal_format, save_images, use_cache, sort_by_sku,
+                             max_jobs, cpus, memory_mb, settings)
+            for (path, *_), job in zip(ready, jobs):
+                logger.info(f"Movido a: {_move(path, inbox, ERROR_DIR if job.error else PROCESSED_DIR)}")
+
+        if once:
+            return
+        time.sleep(interval)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Procesa guías Shein sin interfaz gráfica.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("--marca", choices=BRANDS, default="Marcas y Licencias", help="Marca a procesar")
+        p.add_argument("--modo", choices=MODES, default="laser", help="Tipo de salida")
+        p.add_argument("--termica", choices=THERMAL_FORMATS, default="pdf", help="Formato para la impresora térmica")
+        p.add_argument("--salida", default=default_output(), help="Carpeta base de salida (por marca y fecha)")
+        p.add_argument("--imagenes", action="store_true", help="Guardar también las imágenes intermedias")
+        p.add_argument("--por-sku", action="store_true",
+                       help="Ordenar guías y slips por SKU para el surtido (modo laser)")
+        p.add_argument("--sin-cache", action="store_true", help="No reutilizar resultados de corridas anteriores")
+        p.add_argument("--cache-mb", type=float, default=None, help="Presupuesto de disco del caché en MB")
+        p.add_argument("--ventana", type=int, default=None,
+                       help="Bloques de páginas en vuelo por proceso al rasterizar (acota la memoria)")
+
+    def add_queue(p):
+        p.add_argument("--simultaneos", type=int, default=None, help="Máximo de trabajos a la vez")
+        p.add_argument("--nucleos", type=int, default=None, help="Núcleos para toda la cola (por defecto, todos)")
+        p.add_argument("--memoria-mb", type=int, default=None,
+                       help="Límite de memoria de toda la cola en MB (por defecto, el 80 %% de la libre)")
+
+    p_run = sub.add_parser("procesar", help="Procesa uno o más PDF")
+    add_common(p_run)
+    p_run.add_argument("--dia", default=None, help="Día (Viernes, Sábado, Domingo); por defecto se toma del nombre")
+    p_run.add_argument("pdfs", nargs="+", help="Archivos PDF")
+
+    p_watch = sub.add_parser("vigilar", help="Vigila una carpeta de entrada")
+    add_common(p_watch)
+    p_watch.add_argument("--entrada", required=True, help="Carpeta donde se dejan los PDF")
+    p_watch.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre revisiones")
+    p_watch.add_argument("--una-vez", action="store_true", help="Procesa lo pendiente y termina")
+    add_queue(p_watch)
+
+    p_queue = sub.add_parser("cola", help="Procesa varios PDF (de una o varias marcas) a la vez")
+    add_common(p_queue)
+    add_queue(p_queue)
+    p_queue.add_argument("-t", "--trabajo", nargs="+", action="append", required=True, metavar="ARG",
+                         help="MARCA PDF [MODO [PRIORIDAD]]; se repite por trabajo (mayor prioridad, antes)")
+    return parser
+
+
+def parse_job(values, default_mode, parser):
+    """(pdf, marca, modo, prioridad) de un --trabajo MARCA PDF [MODO [PRIORIDAD]]."""
+    if not 2 <= len(values) <= 4:
+        parser.error(f"--trabajo espera MARCA PDF [MODO [PRIORIDAD]]: {' '.join(values)}")
+    brand, pdf_path = values[0], values[1]
+    mode = values[2] if len(values) > 2 else default_mode
+    if brand not in BRANDS:
+        parser.error(f"Marca '{brand}' no válida (use {', '.join(BRANDS)})")
+    if mode not in MODES:
+        parser.error(f"Modo '{mode}' no válido (use {', '.join(MODES)})")
+    try:
+        priority = int(values[3]) if len(values) > 3 else 0
+    except ValueError:
+        parser.error(f"Prioridad '{values[3]}' no es un número")
+    return pdf_path, brand, mode, priority
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    settings = (args.cache_mb, args.ventana)
+    apply_settings(*settings)
+    use_cache = not args.sin_cache
+
+    if args.command == "procesar":
+        failed = 0
+        for pdf in args.pdfs:
+            try:
+                process_file(pdf, args.marca, args.modo, args.salida, args.dia, args.termica, args.imagenes, use_cache,
+                             args.por_sku)
+            except Exception as e:
+                logger.error(f"❌ Error al procesar {pdf}: {e}")
+                failed += 1
+        return 1 if failed else 0
+
+    if args.command == "cola":
+        jobs = [parse_job(values, args.modo, parser) for values in args.trabajo]
+        done = run_queue(jobs, args.salida, args.termica, args.imagenes, use_cache, args.por_sku,
+                         args.simultaneos, args.nucleos, args.memoria_mb, settings)
+        return 1 if any(job.error for job in done) else 0
+
+    try:
+        watch(args.entrada, args.salida, args.marca, args.modo, args.termica, args.imagenes,
+              args.intervalo, args.una_vez, use_cache, args.por_sku, args.simultaneos, args.nucleos,
+              args.memoria_mb, settings)
+    except KeyboardInterrupt:
+        logger.info("Vigilancia detenida.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
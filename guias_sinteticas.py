@@ -0,0 +1,194 @@
+"""
+Script: guias_sinteticas.py
+Descripción: Genera PDF de guías de prueba parecidos a los de Shein / TikTok:
+             N páginas alternando guía y packing slip, con capa de texto y
+             códigos de barras Code128 vectoriales. Sirven para medir el
+             rendimiento (rendimiento.py) sin usar guías reales de clientes.
+Uso:
+  python guias_sinteticas.py --paginas 1000 guias_1000.pdf
+  python guias_sinteticas.py --paginas 200 --marca tiktok --semilla 7 tiktok_200.pdf
+Notas:
+  - Los datos (guías, pedidos, SKUs, direcciones) son inventados pero tienen
+    el mismo formato que los reales, así que el clasificador, el índice y el
+    orden por SKU funcionan igual que con un PDF del día.
+"""
+
+import argparse
+import logging
+import random
+import sys
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# Página de guía térmica de 4 x 6 in (la misma medida en los slips)
+PAGE = fitz.Rect(0, 0, 288, 432)
+
+MARCAS = ("shein", "tiktok")
+
+# Code128: anchos barra/espacio de cada símbolo (0-102), inicio B y fin
+CODE128 = (
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131",
+)
+CODE128_START_B = "211214"
+CODE128_STOP = "2331112"
+
+NOMBRES = ("María López", "José Hernández", "Ana García", "Luis Martínez", "Sofía Ramírez", "Carlos Torres",
+           "Fernanda Cruz", "Jorge Flores", "Daniela Reyes", "Miguel Morales")
+CALLES = ("Av. Insurgentes Sur", "Calle Hidalgo", "Av. Juárez", "Calle Morelos", "Blvd. Díaz Ordaz",
+          "Av. Universidad", "Calle 5 de Mayo", "Av. Revolución")
+CIUDADES = (("Ciudad de México", "CDMX"), ("Guadalajara", "Jal."), ("Monterrey", "N.L."), ("Puebla", "Pue."),
+            ("Querétaro", "Qro."), ("Mérida", "Yuc."), ("León", "Gto."), ("Toluca", "Edo. Méx."))
+PRODUCTOS = ("Blusa manga larga", "Vestido midi", "Pantalón cargo", "Sudadera oversize", "Falda plisada",
+             "Top básico", "Chamarra de mezclilla", "Short deportivo")
+TALLAS = ("XS", "S", "M", "L", "XL")
+COLORES = ("Negro", "Blanco", "Rosa", "Azul", "Verde", "Beige")
+
+
+def code128_modules(text):
+    """Anchos (en módulos) de barras y espacios alternados del Code128-B de `text`."""
+    values = [ord(ch) - 32 for ch in text]
+    if any(not 0 <= v < 95 for v in values):
+        raise ValueError(f"Code128-B no admite el texto {text!r}")
+    checksum = (104 + sum(i * v for i, v in enumerate(values, 1))) % 103
+    symbols = [CODE128_START_B] + [CODE128[v] for v in values] + [CODE128[checksum], CODE128_STOP]
+    return [int(w) for symbol in symbols for w in symbol]
+
+
+def draw_code128(page, text, rect):
+    """
+    Dibuja el código de barras como rectángulos vectoriales (uno por barra,
+    como los PDF de las paqueterías) ocupando el ancho de `rect`.
+    """
+    widths = code128_modules(text)
+    # 10 módulos de zona en blanco a cada lado
+    module = rect.width / (sum(widths) + 20)
+    x = rect.x0 + 10 * module
+    shape = page.new_shape()
+    for i, w in enumerate(widths):
+        if i % 2 == 0:
+            shape.draw_rect(fitz.Rect(x, rect.y0, x + w * module, rect.y1))
+            shape.finish(color=None, fill=(0, 0, 0))
+        x += w * module
+    shape.commit()
+
+
+def _tracking(rng, brand):
+    if brand == "tiktok":
+        return "604" + "".join(rng.choice("0123456789") for _ in range(10))
+    return "GC" + "".join(rng.choice("0123456789") for _ in range(16))
+
+
+def _address(rng):
+    city, state = rng.choice(CIUDADES)
+    return [
+        rng.choice(NOMBRES),
+        f"{rng.choice(CALLES)} {rng.randint(1, 2999)}",
+        f"Col. Centro, {city}, {state}",
+        f"CP: {rng.randint(1000, 99999):05d}",
+    ]
+
+
+def _label_page(doc, rng, brand, tracking):
+    page = doc.new_page(width=PAGE.width, height=PAGE.height)
+    carrier = "J&T Express" if brand == "tiktok" else "Paquetería Estafeta"
+    page.insert_text((14, 28), carrier, fontsize=14, fontname="hebo")
+    page.insert_text((14, 46), f"Servicio: Estándar   Ruta: {rng.choice('ABCDEFG')}{rng.randint(1, 99):02d}",
+                     fontsize=8)
+    page.draw_line((14, 54), (274, 54), width=1)
+
+    y = 70
+    page.insert_text((14, y), "Remitente:", fontsize=8, fontname="hebo")
+    for line in ("SHEIN DISTRIBUTION MX" if brand == "shein" else "TIKTOK SHOP MX", "Tepotzotlán, Edo. Méx."):
+        y += 11
+        page.insert_text((14, y), line, fontsize=8)
+    y += 18
+    page.insert_text((14, y), "Destinatario:", fontsize=8, fontname="hebo")
+    for line in _address(rng):
+        y += 12
+        page.insert_text((14, y), line, fontsize=10)
+
+    page.insert_text((14, y + 22), f"Peso: {rng.uniform(0.1, 2.5):.2f} kg", fontsize=8)
+    draw_code128(page, tracking, fitz.Rect(14, 250, 274, 330))
+    page.insert_text((60, 346), f"Tracking: {tracking}", fontsize=10, fontname="hebo")
+    return page
+
+
+def _slip_page(doc, rng, brand, tracking, order):
+    page = doc.new_page(width=PAGE.width, height=PAGE.height)
+    page.insert_text((14, 28), "Packing Slip", fontsize=14, fontname="hebo")
+    page.insert_text((14, 46), f"Order No: {order}", fontsize=9)
+    page.insert_text((14, 58), f"Guía: {tracking}", fontsize=8)
+    draw_code128(page, order, fitz.Rect(150, 14, 274, 44))
+
+    y = 84
+    page.insert_text((14, y), "Artículo", fontsize=7, fontname="hebo")
+    page.insert_text((196, y), "Qty     Precio", fontsize=7, fontname="hebo")
+    total = 0.0
+    items = rng.randint(1, 4)
+    for _ in range(items):
+        y += 16
+        sku = f"s{rng.randint(2301, 2412)}{rng.randint(10000000, 99999999)}"
+        price = rng.choice((129, 159, 199, 249, 299, 349)) + 0.0
+        total += price
+        page.insert_text((14, y), rng.choice(PRODUCTOS), fontsize=8)
+        page.insert_text((196, y), f"1       ${price:.2f}", fontsize=8)
+        y += 10
+        page.insert_text((24, y), f"SKU: {sku}   Talla: {rng.choice(TALLAS)}   Color: {rng.choice(COLORES)}",
+                         fontsize=6)
+    page.insert_text((14, y + 24), f"Subtotal: ${total:.2f}   Cantidad de artículos: {items}", fontsize=8)
+    page.insert_text((14, 410), "Gracias por tu compra" if brand == "shein" else "TikTok Shop", fontsize=7)
+    return page
+
+
+def generate_pdf(output_path, pages, brand="shein", seed=0):
+    """
+    Escribe `output_path` con `pages` páginas alternando guía y packing slip
+    (la primera es una guía). Con la misma semilla el PDF sale idéntico.
+    Devuelve el número de páginas.
+    """
+    if brand not in MARCAS:
+        raise ValueError(f"Marca '{brand}' no válida (use {', '.join(MARCAS)})")
+    rng = random.Random(seed)
+    doc = fitz.open()
+    try:
+        tracking = order = None
+        for pno in range(pages):
+            if pno % 2 == 0:
+                tracking = _tracking(rng, brand)
+                order = f"GSUN{rng.randint(10 ** 9, 10 ** 10 - 1)}"
+                _label_page(doc, rng, brand, tracking)
+            else:
+                _slip_page(doc, rng, brand, tracking, order)
+        doc.save(output_path, garbage=4, deflate=True)
+    finally:
+        doc.close()
+    logger.info(f"PDF sintético: {output_path} ({pages} páginas, {brand})")
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera PDF de guías sintéticas para pruebas de rendimiento.")
+    parser.add_argument("salida", help="PDF a generar")
+    parser.add_argument("--paginas", type=int, default=100, help="Número de páginas (guía + slip alternados)")
+    parser.add_argument("--marca", choices=MARCAS, default="shein", help="Formato de guía")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de los datos inventados")
+    args = parser.parse_args(argv)
+    generate_pdf(args.salida, args.paginas, args.marca, args.semilla)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
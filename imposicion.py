@@ -0,0 +1,412 @@
+import json
+import logging
+import os
+
+import fitz  # PyMuPDF
+
+from clasificador import content_bbox
+from empaquetado import pack, sheet_count
+from metricas import stage
+from rasterizador import insert_image_compact
+
+# PyYAML es opcional: sin él las plantillas se escriben en JSON
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+# Puntos PDF por centímetro (1 in = 72 pt = 2.54 cm)
+PT_POR_CM = 72 / 2.54
+
+# Hoja tamaño Carta (8.5 x 11 in) en puntos
+CARTA = fitz.paper_rect("letter")
+
+# Carpeta con las plantillas de maquetación (una por modo o marca)
+PLANTILLAS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plantillas")
+
+ESCALAS = ("ajustar", "estirar", "original")
+ALINEACIONES = ("centro", "arriba-izquierda")
+
+
+def cm(valor):
+    """Convierte centímetros a puntos PDF."""
+    return valor * PT_POR_CM
+
+
+def grid_cells(rows, cols, cell_w_cm, cell_h_cm, margin_cm=0.5, sheet=CARTA, gap_cm=0):
+    """
+    Calcula los rectángulos (en puntos) de una cuadrícula rows x cols
+    anclada a la esquina superior izquierda de la hoja, igual que las
+    tablas que se armaban en Word: celdas de cell_w_cm x cell_h_cm
+    a partir del margen (un número, o (izquierdo, superior)), separadas
+    por gap_cm.
+    """
+    left_cm, top_cm = margin_cm if isinstance(margin_cm, (tuple, list)) else (margin_cm, margin_cm)
+    x0 = sheet.x0 + cm(left_cm)
+    y0 = sheet.y0 + cm(top_cm)
+    w = cm(cell_w_cm)
+    h = cm(cell_h_cm)
+    gap = cm(gap_cm)
+
+    if x0 + cols * w + (cols - 1) * gap > sheet.x1 + 0.5 or y0 + rows * h + (rows - 1) * gap > sheet.y1 + 0.5:
+        logger.warning(
+            f"La cuadrícula {rows}x{cols} de {cell_w_cm}x{cell_h_cm} cm no cabe en la hoja "
+            f"({sheet.width / PT_POR_CM:.2f}x{sheet.height / PT_POR_CM:.2f} cm)"
+        )
+
+    cells = []
+    for r in range(rows):
+        for c in range(cols):
+            x = x0 + c * (w + gap)
+            y = y0 + r * (h + gap)
+            cells.append(fitz.Rect(x, y, x + w, y + h))
+    return cells
+
+
+def _sheet_rect(value):
+    # "letter", "a4"... o [ancho_cm, alto_cm]
+    if isinstance(value, str):
+        return fitz.paper_rect(value)
+    return fitz.Rect(0, 0, cm(value[0]), cm(value[1]))
+
+
+def _margins(value):
+    # Un número para los cuatro lados o {"izquierdo", "superior", "derecho", "inferior"}
+    if isinstance(value, dict):
+        return tuple(value.get(side, 0.5) for side in ("izquierdo", "superior", "derecho", "inferior"))
+    return (value,) * 4
+
+
+class Layout:
+    """
+    Plantilla de maquetación compilada: hoja, cuadrícula de celdas, rotación
+    y modo de escala. Se compila una sola vez y la colocación de cada tamaño
+    de página en cada celda se calcula la primera vez y se reutiliza en todas
+    las hojas, así que imponer una página no hace cálculos de ajuste.
+    Con trim=True ("recortar" en la plantilla) cada página se recorta a su
+    contenido (clasificador.content_bbox) antes de colocarla, para que la
+    guía llene la celda en lugar de sus márgenes en blanco.
+
+    Con pack=True ("empaquetar") no hay cuadrícula: cada página conserva su
+    medida física (por `factor`) y se acomodan en el área útil con
+    empaquetado.pack, separadas al menos gap_cm para el corte; sirve para
+    días con guías de varias medidas (ver impose_packed).
+    """
+
+    def __init__(self, name, sheet, rows, cols, cell_w_cm, cell_h_cm, margins=(0.5,) * 4, gap_cm=0,
+                 rotate=0, scale="ajustar", align="centro", rows_exact=False, trim=False, pack=False,
+                 allow_rotate=True, factor=1.0):
+        if scale not in ESCALAS:
+            raise ValueError(f"Plantilla {name}: escala '{scale}' no válida (use {', '.join(ESCALAS)})")
+        if align not in ALINEACIONES:
+            raise ValueError(f"Plantilla {name}: alineación '{align}' no válida (use {', '.join(ALINEACIONES)})")
+        if rotate % 90:
+            raise ValueError(f"Plantilla {name}: la rotación debe ser múltiplo de 90")
+
+        self.name = name
+        self.sheet = sheet
+        self.rows = rows
+        self.cols = cols
+        self.margins = margins
+        # Una medida de celda vacía ocupa la parte proporcional del área útil
+        usable_w_cm = sheet.width / PT_POR_CM - margins[0] - margins[2]
+        usable_h_cm = sheet.height / PT_POR_CM - margins[1] - margins[3]
+        self.cell_w_cm = cell_w_cm if cell_w_cm else (usable_w_cm - (cols - 1) * gap_cm) / cols
+        self.cell_h_cm = cell_h_cm if cell_h_cm else (usable_h_cm - (rows - 1) * gap_cm) / rows
+        self.rotate = rotate % 360
+        self.scale = scale
+        self.align = align
+        self.rows_exact = rows_exact
+        self.trim = trim
+        self.pack = pack
+        self.allow_rotate = allow_rotate
+        self.factor = factor
+        self.gap_cm = gap_cm
+        self.spec = None
+        self.cells = grid_cells(rows, cols, self.cell_w_cm, self.cell_h_cm, margins[:2], sheet, gap_cm)
+        self._placements = {}
+
+    @classmethod
+    def from_dict(cls, spec, name="plantilla"):
+        cell_w_cm, cell_h_cm = spec.get("celda_cm") or (None, None)
+        packed = spec.get("empaquetar", False)
+        return cls(
+            name=spec.get("nombre", name),
+            sheet=_sheet_rect(spec.get("hoja", "letter")),
+            # Al empaquetar, la única "celda" es el área útil de la hoja
+            rows=spec.get("filas", 1) if packed else spec["filas"],
+            cols=spec.get("columnas", 1) if packed else spec["columnas"],
+            cell_w_cm=cell_w_cm,
+            cell_h_cm=cell_h_cm,
+            margins=_margins(spec.get("margenes_cm", 0.5)),
+            gap_cm=spec.get("separacion_cm", 0),
+            rotate=spec.get("rotacion", 0),
+            scale=spec.get("escala", "ajustar"),
+            align=spec.get("alineacion", "centro"),
+            rows_exact=spec.get("filas_exactas", False),
+            trim=spec.get("recortar", False),
+            pack=packed,
+            allow_rotate=spec.get("girar", True),
+            factor=spec.get("factor", 1.0),
+        )
+
+    @property
+    def per_sheet(self):
+        return len(self.cells)
+
+    @property
+    def area(self):
+        """Área útil de la hoja: de la primera a la última celda."""
+        return fitz.Rect(self.cells[0].tl, self.cells[-1].br)
+
+    def placement(self, pos, src_rect):
+        """Rectángulo donde va una página de tamaño src_rect en la celda pos (memorizado)."""
+        key = (pos, round(src_rect.width, 2), round(src_rect.height, 2))
+        target = self._placements.get(key)
+        if target is None:
+            target = self._placements[key] = self._place(self.cells[pos], src_rect)
+        return target
+
+    def _place(self, cell, src_rect):
+        if self.scale == "estirar":
+            return fitz.Rect(cell)
+        w, h = src_rect.width, src_rect.height
+        if self.rotate % 180:
+            w, h = h, w
+        factor = min(cell.width / w, cell.height / h) if self.scale == "ajustar" else 1
+        w, h = w * factor, h * factor
+        if self.align == "centro":
+            x0 = cell.x0 + (cell.width - w) / 2
+            y0 = cell.y0 + (cell.height - h) / 2
+        else:
+            x0, y0 = cell.x0, cell.y0
+        return fitz.Rect(x0, y0, x0 + w, y0 + h)
+
+
+_layouts = {}
+
+
+def load_layout(name):
+    """
+    Carga y compila la plantilla `name` (ruta a un .json/.yaml, o nombre de
+    un archivo de la carpeta plantillas). Cada plantilla se compila una sola
+    vez por proceso.
+    """
+    if name in _layouts:
+        return _layouts[name]
+
+    path = name if os.path.isfile(name) else None
+    if path is None:
+        for ext in (".json", ".yaml", ".yml"):
+            candidate = os.path.join(PLANTILLAS_DIR, name + ext)
+            if os.path.isfile(candidate):
+                path = candidate
+                break
+    if path is None:
+        raise FileNotFoundError(f"No existe la plantilla '{name}' en {PLANTILLAS_DIR}")
+
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuntimeError(f"PyYAML no está instalado; no se puede leer {path}")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+
+    layout = Layout.from_dict(spec, name=os.path.splitext(os.path.basename(path))[0])
+    # La definición original sirve como firma (p. ej. en la llave del caché)
+    layout.spec = spec
+    _layouts[name] = layout
+    logger.info(f"Plantilla '{layout.name}': {layout.rows}x{layout.cols} celdas de "
+                f"{layout.cell_w_cm:.2f}x{layout.cell_h_cm:.2f} cm, rotación {layout.rotate}°")
+    return layout
+
+
+def layout_for_brand(brand, default):
+    """La plantilla propia de la marca (plantillas/<marca>.json) si existe; si no, `default`."""
+    slug = brand.lower().replace(" ", "_")
+    for ext in (".json", ".yaml", ".yml"):
+        if os.path.isfile(os.path.join(PLANTILLAS_DIR, slug + ext)):
+            return load_layout(slug)
+    return load_layout(default)
+
+
+def impose_pages(src, pages, layout, out=None, sheets=None):
+    """
+    Coloca las páginas `pages` (índices base 0) de `src` en las celdas de la
+    plantilla `layout`, llenando una hoja nueva cada layout.per_sheet páginas.
+    `pages` también acepta pares (documento, página) para mezclar varios PDF.
+    Si se pasa la lista `sheets`, se le agrega la hoja (base 1) donde quedó
+    cada página, en orden (para el índice de guías).
+
+    Las páginas se insertan como vectores con show_pdf_page: no hay
+    rasterizado ni conversión a Word, y los códigos de barras conservan
+    la nitidez del original. Si la plantilla recorta, se muestra solo el
+    contenido de cada página (clip). Devuelve el documento de salida.
+    """
+    if layout.pack:
+        return impose_packed(src, pages, layout, out, sheets)
+    if out is None:
+        out = fitz.open()
+
+    sheet = layout.sheet
+    sheet_page = None
+    with stage("maquetar", plantilla=layout.name) as st:
+        for count, item in enumerate(pages):
+            doc, pno = item if isinstance(item, tuple) else (src, item)
+            pos = count % layout.per_sheet
+            if pos == 0:
+                sheet_page = out.new_page(width=sheet.width, height=sheet.height)
+            page = doc[pno]
+            # show_pdf_page toma el clip sin la rotación de la página de origen:
+            # las páginas giradas (raras en las guías) se colocan completas
+            clip = content_bbox(page) if layout.trim and not page.rotation else None
+            # La colocación ya viene ajustada de la plantilla: no se recalcula la proporción
+            target = layout.placement(pos, clip or page.rect)
+            sheet_page.show_pdf_page(target, doc, pno, keep_proportion=False, rotate=layout.rotate, clip=clip)
+            st.pages += 1
+            if sheets is not None:
+                sheets.append(out.page_count)
+
+    return out
+
+
+def impose_packed(src, pages, layout, out=None, sheets=None):
+    """
+    impose_pages para plantillas con "empaquetar": en lugar de una cuadrícula
+    fija, cada página (recortada a su contenido si la plantilla recorta) va a
+    su medida física por layout.factor y se acomodan con empaquetado.pack en
+    el área útil de la hoja, girando 90° las que así aprovechan mejor el
+    espacio y dejando layout.gap_cm entre ellas para la guillotina. En días
+    con guías de varias medidas salen muchas menos hojas que con 2x2.
+    Devuelve el documento de salida.
+    """
+    if out is None:
+        out = fitz.open()
+
+    area = layout.area
+    gap = cm(layout.gap_cm)
+    with stage("maquetar", plantilla=layout.name) as st:
+        items = []
+        for item in pages:
+            doc, pno = item if isinstance(item, tuple) else (src, item)
+            page = doc[pno]
+            clip = content_bbox(page) if layout.trim and not page.rotation else None
+            rect = clip or page.rect
+            # Más grande que el área útil: se reduce para que quepa (girada, si se permite)
+            w, h = rect.width * layout.factor, rect.height * layout.factor
+            fits = [min(area.width / w, area.height / h)]
+            if layout.allow_rotate:
+                fits.append(min(area.width / h, area.height / w))
+            shrink = min(1.0, max(fits))
+            items.append((doc, pno, clip, w * shrink, h * shrink))
+
+        plan = pack([(w, h) for *_, w, h in items], area.width, area.height, gap, rotate=layout.allow_rotate)
+        first = out.page_count
+        for _ in range(sheet_count(plan)):
+            out.new_page(width=layout.sheet.width, height=layout.sheet.height)
+        for (doc, pno, clip, _, _), spot in zip(items, plan):
+            target = fitz.Rect(area.x0 + spot.x, area.y0 + spot.y,
+                               area.x0 + spot.x + spot.width, area.y0 + spot.y + spot.height)
+            rotate = (layout.rotate + (90 if spot.rotated else 0)) % 360
+            out[first + spot.sheet].show_pdf_page(target, doc, pno, keep_proportion=False, rotate=rotate, clip=clip)
+            st.pages += 1
+            if sheets is not None:
+                sheets.append(first + spot.sheet + 1)
+
+    logger.info(f"Plantilla '{layout.name}': {len(items)} páginas empaquetadas en {sheet_count(plan)} hojas")
+    return out
+
+
+def impose_images(images, layout, out=None):
+    """
+    Como impose_pages, pero con imágenes PIL ya rasterizadas (slips de la
+    salida láser). Cada imagen se codifica según su contenido con
+    insert_image_compact: las guías en blanco y negro quedan en 1 bit
+    CCITT G4 en lugar de JPEG o PNG RGB. Devuelve el documento de salida.
+    """
+    if out is None:
+        out = fitz.open()
+
+    sheet = layout.sheet
+    sheet_page = None
+    # Si `images` es un generador, el tiempo de producir cada imagen cuenta
+    # para la etapa de quien la produce (rasterizar), no para maquetar
+    with stage("maquetar", plantilla=layout.name) as st:
+        for count, img in enumerate(images):
+            pos = count % layout.per_sheet
+            if pos == 0:
+                sheet_page = out.new_page(width=sheet.width, height=sheet.height)
+            target = layout.placement(pos, fitz.Rect(0, 0, *img.size))
+            insert_image_compact(sheet_page, target, img, keep_proportion=False, rotate=layout.rotate)
+            st.pages += 1
+
+    return out
+
+
+def save_pdf(doc, path):
+    """Guarda el PDF con recolección de basura y compresión de streams."""
+    with stage("guardar", pages=doc.page_count, outputs=[path]):
+        doc.save(path, garbage=4, deflate=True)
+    logger.info(f"✅ PDF guardado en: {path} ({doc.page_count} hojas)")
+
+
+def extract_pages(pdf_path, outputs):
+    """
+    Escribe varios PDF con subconjuntos de páginas de `pdf_path` en una sola
+    pasada. `outputs` es {ruta_salida: [páginas en base 1]}.
+
+    El archivo se lee una vez y cada salida es una copia en memoria reducida
+    con select(), que conserva las fuentes, imágenes y XObjects compartidos
+    en lugar de copiarlos página por página como insert_pdf. Se guardan con
+    save_pdf (limpieza y compresión).
+    """
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+
+    for path, indices in outputs.items():
+        if not path:
+            continue
+        part = fitz.open(stream=data, filetype="pdf")
+        try:
+            part.select([i - 1 for i in indices])
+            save_pdf(part, path)
+        finally:
+            part.close()
+
+
+def split_odd_even(pdf_path, odd_path=None, even_path=None):
+    """
+    Separa el PDF en páginas impares (guías → impresora térmica) y pares
+    (packing slips → láser) con extract_pages; solo se guardan las salidas
+    pedidas. Devuelve (odd_indices, even_indices) en base 1.
+    """
+    with fitz.open(pdf_path) as doc:
+        total = doc.page_count
+    odd_indices = list(range(1, total + 1, 2))
+    even_indices = list(range(2, total + 1, 2))
+    extract_pages(pdf_path, {odd_path: odd_indices, even_path: even_indices})
+    return odd_indices, even_indices
+
+
+def impose_pdf(pdf_path, output_path, layout, sheets=None):
+    """
+    Atajo: impone todas las páginas de `pdf_path` con la plantilla `layout`
+    (objeto Layout o nombre de plantilla) y guarda el resultado en `output_path`.
+    `sheets` como en impose_pages. Devuelve (total_paginas, total_hojas).
+    """
+    if isinstance(layout, str):
+        layout = load_layout(layout)
+    src = fitz.open(pdf_path)
+    try:
+        total = src.page_count
+        out = impose_pages(src, range(total), layout, sheets=sheets)
+        try:
+            save_pdf(out, output_path)
+            return total, out.page_count
+        finally:
+            out.close()
+    finally:
+        src.close()
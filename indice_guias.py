@@ -0,0 +1,232 @@
+"""
+Script: indice_guias.py
+Descripción: Índice SQLite de números de guía (tracking), pedidos y SKUs → archivo
+             de origen, página, hoja de salida y fecha. Se llena durante el
+             procesamiento con la capa de texto de cada página.
+Uso:
+  python indice_guias.py GC2404293838166019 6042924807560
+  python indice_guias.py --indexar viernes.pdf sabado.pdf
+"""
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+from metricas import stage
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get("GUIAS_INDICE_DB", os.path.join(os.path.expanduser("~"), "guias_indice.sqlite3"))
+
+TRACKING = "tracking"
+ORDER = "pedido"
+SKU = "sku"
+
+# Papel de la página en su par (solo si se indexó con los pares guía/slip)
+LABEL_ROLE = "guia"
+SLIP_ROLE = "slip"
+
+# Guías de las paqueterías que usa Shein (GC + 16 dígitos, 604 + 10 dígitos)
+TRACKING_PATTERNS = (
+    re.compile(r"\bGC\d{16}\b"),
+    re.compile(r"\b604\d{10}\b"),
+)
+# El número de pedido lleva al menos un dígito: así "Order number" o "Pedido
+# número" sin número no indexan la palabra como pedido
+ORDER_PATTERN = re.compile(
+    r"(?:order|pedido|orden)\s*(?:no\.?|number|n[úu]mero|#)?\s*[:#]?\s*((?=[A-Z0-9-]*\d)[A-Z0-9][A-Z0-9-]{5,})",
+    re.IGNORECASE,
+)
+SKU_PATTERN = re.compile(r"\bsku\s*[:#]?\s*([A-Za-z0-9][A-Za-z0-9_-]{3,})", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    pair_page INTEGER,
+    role TEXT,
+    output TEXT,
+    sheet INTEGER,
+    date TEXT NOT NULL,
+    UNIQUE (source, page)
+);
+CREATE TABLE IF NOT EXISTS codes (
+    code TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    page_id INTEGER NOT NULL REFERENCES pages (id) ON DELETE CASCADE,
+    PRIMARY KEY (code, page_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_codes_page ON codes (page_id);
+CREATE INDEX IF NOT EXISTS idx_pages_date ON pages (date);
+"""
+
+
+def connect(db_path=None):
+    """Abre (y crea si hace falta) la base del índice."""
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL: los tres días del fin de semana pueden escribir a la vez
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    # Bases creadas antes de guardar el papel de cada página
+    if "role" not in {row["name"] for row in conn.execute("PRAGMA table_info(pages)")}:
+        conn.execute("ALTER TABLE pages ADD COLUMN role TEXT")
+    return conn
+
+
+def extract_codes(text):
+    """Devuelve los códigos de la página como una lista de (código, tipo) sin repetir."""
+    found = {}
+    for pattern in TRACKING_PATTERNS:
+        for match in pattern.findall(text):
+            found.setdefault(match, TRACKING)
+    for match in ORDER_PATTERN.findall(text):
+        found.setdefault(match.upper(), ORDER)
+    for match in SKU_PATTERN.findall(text):
+        found.setdefault(match, SKU)
+    return list(found.items())
+
+
+def placements_for(label_pages, label_output, slip_pages, slip_output, slips_per_sheet):
+    """
+    Hoja de salida de cada página (base 1): cada guía ocupa su propia hoja en
+    el archivo térmico y los slips van `slips_per_sheet` por hoja en el láser.
+    """
+    placements = {pno: (label_output, i + 1) for i, pno in enumerate(label_pages)}
+    placements.update({pno: (slip_output, i // slips_per_sheet + 1) for i, pno in enumerate(slip_pages)})
+    return placements
+
+
+def index_pdf(pdf_path, placements=None, pairs=None, date=None, db_path=None):
+    """
+    Indexa los códigos de cada página de `pdf_path`.
+
+    placements es {pagina: (archivo_salida, hoja)} y pairs una lista de
+    (pagina_guia, pagina_slip), ambos en base 1, para saber dónde quedó cada
+    página, cuál es su pareja y si es la guía o el slip (el slip también
+    trae el número de guía). Volver a indexar el mismo archivo reemplaza
+    sus entradas. Devuelve el número de códigos registrados.
+    """
+    placements = placements or {}
+    partner = {}
+    role = {}
+    for label, slip in pairs or ():
+        if label:
+            role[label] = LABEL_ROLE
+        if slip:
+            role[slip] = SLIP_ROLE
+        if label and slip:
+            partner[label] = slip
+            partner[slip] = label
+    source = os.path.abspath(pdf_path)
+    date = date or datetime.now().strftime("%Y-%m-%d")
+
+    with stage("indexar") as st:
+        rows = []
+        with fitz.open(pdf_path) as doc:
+            st.pages = doc.page_count
+            for page in doc:
+                codes = extract_codes(page.get_text("text"))
+                if codes:
+                    rows.append((page.number + 1, codes))
+
+        total = 0
+        conn = connect(db_path)
+        try:
+            with conn:
+                conn.execute("DELETE FROM pages WHERE source = ?", (source,))
+                for pno, codes in rows:
+                    output, sheet = placements.get(pno, (None, None))
+                    cur = conn.execute(
+                        "INSERT INTO pages (source, page, pair_page, role, output, sheet, date) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (source, pno, partner.get(pno), role.get(pno), output and os.path.abspath(output), sheet,
+                         date),
+                    )
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO codes (code, kind, page_id) VALUES (?, ?, ?)",
+                        [(code, kind, cur.lastrowid) for code, kind in codes],
+                    )
+                    total += len(codes)
+        finally:
+            conn.close()
+
+    logger.info(f"Índice: {total} códigos de {len(rows)} páginas de {os.path.basename(pdf_path)}")
+    return total
+
+
+def safe_index_pdf(pdf_path, placements=None, pairs=None, date=None, db_path=None):
+    """Como index_pdf, pero un problema con el índice nunca detiene el procesamiento."""
+    try:
+        return index_pdf(pdf_path, placements, pairs, date, db_path)
+    except (sqlite3.Error, OSError, RuntimeError) as e:
+        logger.warning(f"No se pudo actualizar el índice de guías: {e}")
+        return 0
+
+
+def stored_placements(pdf_path, db_path=None):
+    """{pagina: (archivo_salida, hoja)} ya registrados para `pdf_path`, para reindexarlo sin perderlos."""
+    conn = connect(db_path)
+    try:
+        rows = conn.execute("SELECT page, output, sheet FROM pages WHERE source = ? AND output IS NOT NULL",
+                            (os.path.abspath(pdf_path),)).fetchall()
+    finally:
+        conn.close()
+    return {row["page"]: (row["output"], row["sheet"]) for row in rows}
+
+
+def lookup(code, db_path=None):
+    """
+    Busca un código exacto. Devuelve una lista de dicts, de la fecha más
+    reciente a la más antigua (a igual fecha, en el orden en que se indexaron).
+    """
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            """
+            SELECT c.code, c.kind, p.source, p.page, p.pair_page, p.role, p.output, p.sheet, p.date
+            FROM codes c JOIN pages p ON p.id = c.page_id
+            WHERE c.code = ?
+            ORDER BY p.date DESC, c.page_id
+            """,
+            (code.strip().strip("'\""),),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca guías, pedidos y SKUs en el índice.")
+    parser.add_argument("codigos", nargs="*", help="Códigos a buscar")
+    parser.add_argument("--indexar", nargs="+", metavar="PDF", help="Indexar estos PDF")
+    parser.add_argument("--db", default=None, help=f"Base del índice (por defecto {DB_PATH})")
+    args = parser.parse_args(argv)
+
+    for pdf in args.indexar or ():
+        index_pdf(pdf, db_path=args.db)
+
+    missing = 0
+    for code in args.codigos:
+        rows = lookup(code, args.db)
+        if not rows:
+            print(f"{code}: no encontrado")
+            missing += 1
+        for row in rows:
+            where = f" → {os.path.basename(row['output'])}, hoja {row['sheet']}" if row["output"] else ""
+            pair = f" (pareja: página {row['pair_page']})" if row["pair_page"] else ""
+            print(f"{row['code']} [{row['kind']}] {row['date']}: {row['source']}, página {row['page']}{pair}{where}")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
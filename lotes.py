@@ -0,0 +1,275 @@
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+import rasterizador
+from rasterizador import default_workers
+
+# psutil es opcional: sin él no hay límite de memoria si no se da uno
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Memoria estimada de un trabajo de la cola: el proceso principal más cada
+# proceso del rasterizador. No crece con el PDF: render_pages solo tiene en
+# vuelo una ventana acotada de páginas (rasterizador.WINDOW_PER_WORKER)
+JOB_MEMORY_MB = int(os.environ.get("GUIAS_MEMORIA_TRABAJO", "250"))
+WORKER_MEMORY_MB = int(os.environ.get("GUIAS_MEMORIA_PROCESO", "80"))
+
+# Límite global de memoria de la cola en MB (0 = 80 % de la libre, si hay psutil)
+MEMORY_BUDGET_MB = int(os.environ.get("GUIAS_MEMORIA_MB", "0"))
+
+# Estados de un trabajo
+WAITING = "en espera"
+RUNNING = "procesando"
+DONE = "terminado"
+FAILED = "error"
+
+
+def _report(queue, day, percent, message=""):
+    queue.put((day, percent, message))
+
+
+def _run_day(fn, day, queue, args, kwargs):
+    """
+    Corre dentro del proceso hijo: llama a fn con un callback de progreso
+    que manda (día, porcentaje, mensaje) a la cola compartida y devuelve
+    el resumen que regrese fn junto con el tiempo que tardó.
+    """
+    start = time.perf_counter()
+    summary = fn(*args, progress=partial(_report, queue, day), **kwargs) or {}
+    summary["segundos"] = round(time.perf_counter() - start, 1)
+    _report(queue, day, 100, "Terminado")
+    return summary
+
+
+def run_days_concurrently(fn, jobs, on_progress=None):
+    """
+    Procesa cada día de `jobs` ({día: (args, kwargs)}) en su propio proceso,
+    llamando a fn(*args, progress=..., workers=..., **kwargs).
+
+    Los días son independientes, así que corren a la vez; los procesos del
+    rasterizador se reparten entre ellos para no saturar la máquina.
+    `on_progress(día, porcentaje_día, porcentaje_total, mensaje)` se llama
+    desde un hilo del proceso principal con el avance agregado.
+
+    Devuelve {día: resumen}; si un día falla, su resumen es {"error": str}.
+    """
+    days = list(jobs)
+    workers_per_day = max(1, default_workers() // max(1, len(days)))
+    percents = {day: 0 for day in days}
+    results = {}
+
+    with multiprocessing.Manager() as manager:
+        queue = manager.Queue()
+
+        def drain():
+            while True:
+                item = queue.get()
+                if item is None:
+                    return
+                day, percent, message = item
+                percents[day] = percent
+                if on_progress:
+                    overall = sum(percents.values()) / len(percents)
+                    on_progress(day, percent, overall, message)
+
+        listener = threading.Thread(target=drain, daemon=True)
+        listener.start()
+
+        with ProcessPoolExecutor(max_workers=len(days)) as pool:
+            futures = {}
+            for day in days:
+                args, kwargs = jobs[day]
+                kwargs = dict(kwargs, workers=workers_per_day)
+                futures[day] = pool.submit(_run_day, fn, day, queue, args, kwargs)
+                logger.info(f"▶ [{day}] Enviado a su propio proceso")
+
+            for day, future in futures.items():
+                try:
+                    results[day] = future.result()
+                except Exception as e:
+                    logger.error(f"❌ [{day}] Falló el procesamiento: {e}")
+                    results[day] = {"error": str(e)}
+
+        queue.put(None)
+        listener.join()
+
+    log_summary(results)
+    return results
+
+
+def log_summary(results):
+    """Registra un resumen combinado de todos los días."""
+    logger.info("=== Resumen fin de semana ===")
+    for day, summary in results.items():
+        if "error" in summary:
+            logger.info(f"{day}: ERROR - {summary['error']}")
+            continue
+        details = ", ".join(f"{k}: {v}" for k, v in summary.items() if k != "segundos")
+        logger.info(f"{day}: {details} ({summary.get('segundos', 0)} s)")
+
+
+def _run_job(fn, workers, args, kwargs):
+    """
+    Corre dentro del proceso del trabajo: limita el rasterizador a `workers`
+    procesos y devuelve el resumen de fn con el tiempo que tardó.
+    """
+    rasterizador.MAX_WORKERS = workers
+    start = time.perf_counter()
+    summary = fn(*args, **kwargs) or {}
+    summary["segundos"] = round(time.perf_counter() - start, 1)
+    return summary
+
+
+class Job:
+    """Un trabajo de la cola: nombre, prioridad, estado y resumen al terminar."""
+
+    def __init__(self, name, args, kwargs, priority=0):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.state = WAITING
+        self.summary = None
+        self.error = None
+        self.started = None
+        self.seconds = None
+
+    def status(self):
+        info = {"trabajo": self.name, "prioridad": self.priority, "estado": self.state}
+        if self.seconds is not None:
+            info["segundos"] = self.seconds
+        if self.error:
+            info["error"] = self.error
+        return info
+
+
+class JobQueue:
+    """
+    Cola de trabajos independientes (p. ej. un PDF por marca) que corren a la
+    vez, cada uno en su propio proceso, llamando a fn(*args, **kwargs).
+
+    - Los de mayor prioridad arrancan primero; a igual prioridad, en el orden
+      en que se agregaron.
+    - Límite global de CPU: `cpus` núcleos (por defecto todos) repartidos
+      entre los trabajos simultáneos; cada uno limita su rasterizador a su
+      parte (rasterizador.MAX_WORKERS).
+    - Límite global de memoria: `memory_mb` (por defecto MEMORY_BUDGET_MB o
+      el 80 % de la memoria libre); si la memoria estimada no cabe, se bajan
+      los procesos del rasterizador y luego los trabajos simultáneos (al
+      menos uno siempre corre).
+    - on_status(job) se llama en el proceso principal cada vez que un trabajo
+      cambia de estado.
+    - initializer(*initargs) corre al arrancar cada proceso de la cola: con
+      spawn (Windows) los módulos se vuelven a importar y los ajustes hechos
+      en el proceso principal no llegan solos.
+    """
+
+    def __init__(self, fn, cpus=None, max_jobs=None, memory_mb=None, on_status=None, initializer=None,
+                 initargs=()):
+        self.fn = fn
+        self.initializer = initializer
+        self.initargs = initargs
+        self.cpus = cpus or default_workers()
+        self.max_jobs = max_jobs
+        self.memory_mb = memory_mb if memory_mb is not None else _memory_budget_mb()
+        self.on_status = on_status
+        self.jobs = []
+        self._order = itertools.count()
+        self._pending = []
+
+    def submit(self, name, args=(), kwargs=None, priority=0):
+        job = Job(name, args, kwargs or {}, priority)
+        self.jobs.append(job)
+        heapq.heappush(self._pending, (-priority, next(self._order), job))
+        return job
+
+    def plan(self):
+        """(trabajos simultáneos, procesos del rasterizador por trabajo) según los límites."""
+        # Sin memoria para todos, primero se quitan procesos del rasterizador
+        # (la maquetación corre en el proceso del trabajo) y luego trabajos
+        for slots in range(min(len(self._pending) or 1, self.max_jobs or self.cpus), 0, -1):
+            for workers in range(max(1, self.cpus // slots), 0, -1):
+                needed = slots * (JOB_MEMORY_MB + workers * WORKER_MEMORY_MB)
+                if not self.memory_mb or needed <= self.memory_mb:
+                    return slots, workers
+        return 1, 1
+
+    def status(self):
+        return [job.status() for job in self.jobs]
+
+    def _set_state(self, job, state):
+        job.state = state
+        if self.on_status:
+            self.on_status(job)
+
+    def run(self):
+        """Corre todo lo pendiente y espera a que termine. Devuelve los trabajos."""
+        if not self._pending:
+            return self.jobs
+        slots, workers = self.plan()
+        logger.info(f"Cola: {len(self._pending)} trabajos, {slots} a la vez con {workers} procesos cada uno")
+
+        with ProcessPoolExecutor(max_workers=slots, initializer=self.initializer, initargs=self.initargs) as pool:
+            running = {}
+            while self._pending or running:
+                # Solo se envía cuando hay lugar: la prioridad decide quién sigue
+                while self._pending and len(running) < slots:
+                    _, _, job = heapq.heappop(self._pending)
+                    job.started = time.perf_counter()
+                    running[pool.submit(_run_job, self.fn, workers, job.args, job.kwargs)] = job
+                    self._set_state(job, RUNNING)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = running.pop(future)
+                    job.seconds = round(time.perf_counter() - job.started, 1)
+                    try:
+                        job.summary = future.result()
+                        if "error" in job.summary:
+                            job.error = str(job.summary["error"])
+                    except Exception as e:
+                        job.error = str(e)
+                    self._set_state(job, FAILED if job.error else DONE)
+
+        log_jobs(self.jobs)
+        return self.jobs
+
+
+def _memory_budget_mb():
+    if MEMORY_BUDGET_MB > 0:
+        return MEMORY_BUDGET_MB
+    if psutil is not None:
+        return int(psutil.virtual_memory().available / 1024 / 1024 * 0.8)
+    return 0
+
+
+def log_job_status(job):
+    """on_status por defecto: una línea de log por cambio de estado."""
+    if job.state == RUNNING:
+        logger.info(f"▶ [{job.name}] Procesando (prioridad {job.priority})")
+    elif job.state == DONE:
+        logger.info(f"✅ [{job.name}] Terminado en {job.seconds} s")
+    elif job.state == FAILED:
+        logger.error(f"❌ [{job.name}] Falló en {job.seconds} s: {job.error}")
+
+
+def log_jobs(jobs):
+    """Registra un resumen combinado de todos los trabajos de la cola."""
+    logger.info("=== Resumen de la cola ===")
+    for job in jobs:
+        if job.error:
+            logger.info(f"{job.name}: ERROR - {job.error}")
+            continue
+        details = ", ".join(f"{k}: {v}" for k, v in (job.summary or {}).items() if k != "segundos")
+        logger.info(f"{job.name}: {details} ({job.seconds} s)")
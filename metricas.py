@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Archivo JSON lines con una línea por etapa y una de resumen por corrida
+# (vacío = no se escribe); se puede cambiar por variable de entorno
+METRICAS_PATH = os.environ.get("GUIAS_METRICAS", os.path.join(os.path.expanduser("~"), "guias_metricas.jsonl"))
+
+_write_lock = threading.Lock()
+# Corrida y etapas activas de cada hilo, para que el hilo de trabajo de una
+# ventana no mezcle sus etapas con las de otro. Los días del fin de semana
+# corren en procesos aparte (lotes): cada uno tiene su propio estado
+_local = threading.local()
+
+
+def _cpu():
+    # CPU del hilo más la de los procesos hijos ya terminados (pool de rasterizado);
+    # la de los hijos es aproximada si varios hilos del mismo proceso rasterizan a la vez
+    t = os.times()
+    return time.thread_time() + t.children_user + t.children_system
+
+
+def _emit(record):
+    path = METRICAS_PATH
+    if not path:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    try:
+        with _write_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logger.warning(f"No se pudieron escribir las métricas en {path}: {e}")
+
+
+class Stage:
+    """
+    Medición de una etapa: tiempo de reloj, tiempo de CPU, páginas y bytes
+    escritos. Las etapas se pueden anidar (guardar dentro de separar, por
+    ejemplo): el tiempo de una etapa interna se descuenta de la externa, así
+    la suma de las etapas es el tiempo total de la corrida.
+    """
+
+    def __init__(self, name, pages=0, outputs=(), **info):
+        self.name = name
+        self.pages = pages
+        self.outputs = list(outputs)
+        self.info = info
+        self.wall = 0.0
+        self.cpu = 0.0
+        self._child_wall = 0.0
+        self._child_cpu = 0.0
+
+    def add_output(self, path):
+        self.outputs.append(path)
+
+    @contextmanager
+    def interval(self):
+        """Cuenta el tiempo del bloque para esta etapa (se puede llamar varias veces)."""
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        stack.append(self)
+        wall0, cpu0 = time.perf_counter(), _cpu()
+        try:
+            yield self
+        finally:
+            wall, cpu = time.perf_counter() - wall0, _cpu() - cpu0
+            stack.pop()
+            self.wall += wall - self._child_wall
+            self.cpu += cpu - self._child_cpu
+            self._child_wall = self._child_cpu = 0.0
+            if parent is not None:
+                parent._child_wall += wall
+                parent._child_cpu += cpu
+
+    def finish(self):
+        written = 0
+        for path in self.outputs:
+            try:
+                written += os.path.getsize(path)
+            except OSError:
+                pass
+        run = getattr(_local, "run", None)
+        record = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "corrida": run["id"] if run else None,
+            "trabajo": run["label"] if run else None,
+            "etapa": self.name,
+            "segundos": round(self.wall, 4),
+            "cpu_s": round(self.cpu, 4),
+            "paginas": self.pages,
+            "bytes": written,
+        }
+        record.update(self.info)
+        if run is not None:
+            run["stages"].append(record)
+        _emit(record)
+        return record
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def stage(name, pages=0, outputs=(), **info):
+    """
+    Mide el bloque como la etapa `name` (abrir, clasificar, rasterizar,
+    maquetar, convertir, separar, guardar...). Dentro del bloque se pueden
+    ajustar st.pages y agregar salidas con st.add_output(ruta).
+    """
+    st = Stage(name, pages, outputs, **info)
+    try:
+        with st.interval():
+            yield st
+    finally:
+        st.finish()
+
+
+def timed_iter(name, iterable, **info):
+    """
+    Envuelve un generador (p. ej. render_pages) y mide solo el tiempo que
+    pasa produciendo cada elemento, no el que el consumidor tarda en usarlo;
+    cada elemento cuenta como una página.
+    """
+    st = Stage(name, **info)
+    iterator = iter(iterable)
+    try:
+        while True:
+            with st.interval():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            st.pages += 1
+            yield item
+    finally:
+        st.finish()
+
+
+@contextmanager
+def run(label):
+    """
+    Corrida completa de un PDF: agrupa sus etapas bajo un mismo id y al
+    terminar escribe el resumen en el log y en el JSON lines.
+    """
+    previous = getattr(_local, "run", None)
+    current = _local.run = {"id": uuid.uuid4().hex[:12], "label": label, "stages": []}
+    wall0 = time.perf_counter()
+    try:
+        yield current
+    finally:
+        _local.run = previous
+        summarize(current, time.perf_counter() - wall0)
+
+
+def summarize(current, total_wall):
+    """Totales por etapa de la corrida ("rasterizar: 812 páginas, 41.2 s, 19.7 págs/s")."""
+    totals = {}
+    for record in current["stages"]:
+        t = totals.setdefault(record["etapa"], {"segundos": 0.0, "cpu_s": 0.0, "paginas": 0, "bytes": 0})
+        for key in t:
+            t[key] += record[key]
+    if not totals:
+        return None
+
+    lines = []
+    for name, t in sorted(totals.items(), key=lambda kv: -kv[1]["segundos"]):
+        rate = f", {t['paginas'] / t['segundos']:.1f} págs/s" if t["paginas"] and t["segundos"] > 0 else ""
+        size = f", {t['bytes'] / 1024 / 1024:.1f} MB escritos" if t["bytes"] else ""
+        lines.append(f"  {name}: {t['paginas']} páginas, {t['segundos']:.1f} s (CPU {t['cpu_s']:.1f} s){rate}{size}")
+    measured = sum(t["segundos"] for t in totals.values())
+    logger.info(f"⏱ Tiempos de {current['label']} ({total_wall:.1f} s en total, "
+                f"{max(0.0, total_wall - measured):.1f} s fuera de las etapas):\n" + "\n".join(lines))
+
+    _emit({
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "corrida": current["id"],
+        "trabajo": current["label"],
+        "etapa": "resumen",
+        "segundos": round(total_wall, 4),
+        "etapas": {name: {k: round(v, 4) for k, v in t.items()} for name, t in totals.items()},
+    })
+    return totals
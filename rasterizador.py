@@ -0,0 +1,338 @@
+import io
+import logging
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageChops, features
+
+from clasificador import content_bbox
+
+logger = logging.getLogger(__name__)
+
+# Páginas que procesa cada tarea del pool; bloques pequeños mantienen
+# el orden de entrega fluido sin pagar el costo de una tarea por página
+CHUNK_SIZE = 8
+
+# Bloques en vuelo por proceso del pool: acota la memoria del rasterizado
+# (a lo más workers * WINDOW_PER_WORKER * CHUNK_SIZE páginas a la vez, sin
+# importar cuántas tenga el PDF); se puede cambiar por variable de entorno
+WINDOW_PER_WORKER = int(os.environ.get("GUIAS_VENTANA", "2"))
+
+# Máximo de procesos del rasterizador (0 = uno por núcleo); la cola de
+# trabajos (lotes.JobQueue) lo baja en cada trabajo para repartir los núcleos
+MAX_WORKERS = int(os.environ.get("GUIAS_PROCESOS", "0"))
+
+# Resolución de las impresoras láser de la bodega
+LASER_DPI = 300
+
+# Tipos de contenido para elegir la codificación de cada imagen
+BITONAL = "bitonal"   # guías y slips: texto y códigos de barras → 1 bit (CCITT G4 / Flate)
+GRAY = "gris"         # escala de grises o pocos colores → Flate (PNG), sin pérdida
+PHOTO = "foto"        # fotografías reales → JPEG
+
+# Proporción máxima de tonos medios (32..223) entre los pixeles con tinta
+# para tratar la imagen como blanco y negro: en texto y códigos de barras
+# rasterizados solo el antialias de los bordes es gris (0.25-0.45); una
+# foto, aunque ocupe el 2 % del slip, la sube a más de 0.6
+BITONAL_MIDTONES = 0.55
+
+# Más colores distintos que esto en una imagen a color = fotografía
+PHOTO_COLORS = 256
+PHOTO_QUALITY = 90
+
+
+def default_workers():
+    cpus = max(1, os.cpu_count() or 1)
+    return min(cpus, MAX_WORKERS) if MAX_WORKERS > 0 else cpus
+
+
+def plan_zoom(rect, min_size=None, cell_cm=None, dpi=LASER_DPI):
+    """
+    Calcula de una sola vez el zoom con el que hay que renderizar una página
+    de tamaño `rect` (en puntos):
+
+      - min_size=(ancho_px, alto_px): el menor zoom (>= 1) que alcanza ese
+        tamaño mínimo, como hacía pdf_to_jpg, pero sin renderizar dos veces.
+      - cell_cm=(ancho_cm, alto_cm): el zoom que llena la celda física a `dpi`
+        sin deformar; cualquiera de las dos medidas puede ser None.
+
+    Sin ninguno de los dos se renderiza a 72 dpi (zoom 1).
+    """
+    if cell_cm:
+        cell_w_cm, cell_h_cm = cell_cm
+        zooms = []
+        if cell_w_cm:
+            zooms.append(cell_w_cm / 2.54 * dpi / rect.width)
+        if cell_h_cm:
+            zooms.append(cell_h_cm / 2.54 * dpi / rect.height)
+        return min(zooms)
+    if min_size:
+        min_width, min_height = min_size
+        return max(1.0, min_width / rect.width, min_height / rect.height)
+    return 1.0
+
+
+def pixmap_to_image(pix, mode="RGB"):
+    """
+    Envuelve los pixeles del pixmap en una imagen PIL sin copiarlos
+    (frombuffer sobre samples_mv). La imagen solo es válida mientras el
+    pixmap siga vivo; para modo "1" se umbraliza a blanco y negro puro,
+    que conserva los bordes de los códigos de barras sin ruido de tramado.
+    """
+    raw_mode = "L" if pix.n == 1 else "RGB"
+    img = Image.frombuffer(raw_mode, (pix.width, pix.height), pix.samples_mv, "raw", raw_mode, pix.stride, 1)
+    if mode == "1":
+        return to_bitonal(img)
+    return img
+
+
+def to_bitonal(img):
+    """Umbraliza a blanco y negro puro (modo "1") sin tramado."""
+    if img.mode == "1":
+        return img
+    if img.mode != "L":
+        img = img.convert("L")
+    return img.point(lambda v: 255 if v >= 128 else 0, "1")
+
+
+def is_blank(img):
+    """True si la imagen es completamente blanca (página sin contenido)."""
+    if img.mode not in ("L", "1"):
+        img = img.convert("L")
+    return img.getextrema() == (255, 255)
+
+
+def image_to_stream(img, fmt="PNG", **save_kwargs):
+    """
+    Codifica la imagen en un BytesIO listo para doc.add_picture o
+    page.insert_image, sin escribir archivos temporales en disco.
+    """
+    if fmt == "JPEG":
+        save_kwargs.setdefault("quality", 95)
+    stream = io.BytesIO()
+    img.save(stream, format=fmt, **save_kwargs)
+    stream.seek(0)
+    return stream
+
+
+def _is_gray(rgb):
+    """True si los tres canales son prácticamente iguales (gris guardado como RGB)."""
+    r, g, b = rgb.split()
+    spread = ImageChops.lighter(ImageChops.difference(r, g), ImageChops.difference(g, b))
+    return spread.getextrema()[1] <= 8
+
+
+def image_kind(img):
+    """
+    Clasifica la imagen para elegir su codificación: BITONAL (texto y
+    barras, los grises son solo el antialias de los bordes), GRAY (grises o
+    pocos colores) o PHOTO (color continuo).
+    """
+    if img.mode == "1":
+        return BITONAL
+    if img.mode != "L":
+        rgb = img.convert("RGB")
+        if not _is_gray(rgb):
+            return PHOTO if rgb.getcolors(PHOTO_COLORS) is None else GRAY
+        img = rgb.convert("L")
+    histogram = img.histogram()
+    ink = sum(histogram[:224])
+    return BITONAL if sum(histogram[32:224]) <= BITONAL_MIDTONES * ink else GRAY
+
+
+def encode_image(img, kind=None):
+    """
+    Codifica la imagen según su contenido en un BytesIO (para add_picture o
+    insert_image): BITONAL → PNG de 1 bit, GRAY → PNG (Flate, sin pérdida) y
+    solo PHOTO → JPEG. Sin optimize de PNG: cuesta 3-4 veces más tiempo por
+    página y solo ahorra unos KB.
+    """
+    kind = kind or image_kind(img)
+    if kind == BITONAL:
+        return image_to_stream(to_bitonal(img))
+    if kind == PHOTO:
+        return image_to_stream(img.convert("RGB"), "JPEG", quality=PHOTO_QUALITY)
+    if img.mode not in ("L", "P"):
+        img = img.convert("RGB")
+        if _is_gray(img):
+            img = img.convert("L")
+    return image_to_stream(img)
+
+
+def ccitt_g4(img):
+    """
+    Datos CCITT Group 4 (la compresión de los faxes) de la imagen en blanco y
+    negro, listos para un stream /CCITTFaxDecode del PDF. Pillow los escribe
+    en un TIFF de una sola tira y de ahí se toman tal cual. None si Pillow no
+    tiene libtiff.
+    """
+    if not features.check("libtiff"):
+        return None
+    bw = to_bitonal(img)
+    tiff = io.BytesIO()
+    bw.save(tiff, format="TIFF", compression="group4", tiffinfo={278: bw.height})
+    with Image.open(tiff) as parsed:
+        offset, length = parsed.tag_v2[273][0], parsed.tag_v2[279][0]
+    return tiff.getvalue()[offset:offset + length]
+
+
+def _insert_xobject(page, rect, size, colorspace, bpc, data, filter_name, decode_parms=None,
+                    keep_proportion=True, rotate=0):
+    """
+    Crea el XObject de imagen con los datos ya comprimidos y lo coloca en la
+    página. PyMuPDF guarda las imágenes que recibe sin comprimir hasta el
+    save(); así el documento en memoria solo crece lo que pesa cada imagen
+    comprimida.
+    """
+    doc = page.parent
+    w, h = size
+    xref = doc.get_new_xref()
+    doc.update_object(xref, f"<</Type/XObject/Subtype/Image/Width {w}/Height {h}"
+                            f"/BitsPerComponent {bpc}/ColorSpace/{colorspace}>>")
+    doc.update_stream(xref, data, compress=0)
+    # Después de update_stream, que reescribe el filtro del stream
+    doc.xref_set_key(xref, "Filter", f"/{filter_name}")
+    if decode_parms:
+        doc.xref_set_key(xref, "DecodeParms", decode_parms)
+    page.insert_image(rect, xref=xref, keep_proportion=keep_proportion, rotate=rotate)
+    return xref
+
+
+def insert_image_compact(page, rect, img, keep_proportion=True, rotate=0, kind=None):
+    """
+    Inserta la imagen en la página con la codificación más compacta que no
+    suaviza los códigos de barras: el contenido en blanco y negro va como
+    1 bit CCITT G4 (o Flate de 1 bit si Pillow no tiene libtiff), los grises
+    y colores planos como Flate y solo las fotos como JPEG. PyMuPDF no
+    escribe CCITT por sí solo, así que esos XObjects se arman a mano.
+    Devuelve el xref de la imagen.
+    """
+    kind = kind or image_kind(img)
+    place = {"keep_proportion": keep_proportion, "rotate": rotate}
+    if kind == PHOTO:
+        # El JPEG se guarda tal cual (DCTDecode), sin volver a comprimir
+        return page.insert_image(rect, stream=encode_image(img, kind), **place)
+
+    if kind == BITONAL:
+        data = ccitt_g4(img)
+        if data is not None:
+            w, h = img.size
+            return _insert_xobject(page, rect, img.size, "DeviceGray", 1, data, "CCITTFaxDecode",
+                                   f"<</K -1/Columns {w}/Rows {h}/BlackIs1 true>>", **place)
+        # En modo "1" de Pillow el bit 1 es blanco, igual que en DeviceGray
+        img, colorspace, bpc = to_bitonal(img), "DeviceGray", 1
+    elif img.mode == "L":
+        colorspace, bpc = "DeviceGray", 8
+    else:
+        img = img.convert("RGB")
+        if _is_gray(img):
+            img, colorspace = img.convert("L"), "DeviceGray"
+        else:
+            colorspace = "DeviceRGB"
+        bpc = 8
+    return _insert_xobject(page, rect, img.size, colorspace, bpc, zlib.compress(img.tobytes()), "FlateDecode",
+                           **place)
+
+
+def _render_chunk(pdf_path, page_numbers, spec):
+    """
+    Tarea del pool: cada proceso abre su propio fitz.Document (los documentos
+    de PyMuPDF no se pueden compartir entre procesos) y devuelve los pixeles
+    crudos de cada página.
+    """
+    mode = spec.get("mode", "RGB")
+    colorspace = fitz.csRGB if mode == "RGB" else fitz.csGRAY
+    matrices = {}
+    rendered = []
+    doc = fitz.open(pdf_path)
+    try:
+        for pno in page_numbers:
+            page = doc.load_page(pno)
+            # Con trim solo se renderiza el contenido (sin los márgenes en blanco)
+            clip = content_bbox(page) if spec.get("trim") else None
+            rect = clip or page.rect
+            # Las guías de un mismo PDF comparten tamaño: la matriz se calcula
+            # una vez por tamaño de página y se reutiliza
+            key = (round(rect.width, 2), round(rect.height, 2))
+            if key not in matrices:
+                zoom = plan_zoom(rect, spec.get("min_size"), spec.get("cell_cm"), spec.get("dpi", LASER_DPI))
+                matrices[key] = fitz.Matrix(zoom, zoom)
+            pix = page.get_pixmap(matrix=matrices[key], colorspace=colorspace, alpha=False, clip=clip)
+            img = pixmap_to_image(pix, mode)
+            rendered.append((pno, img.mode, img.size, img.tobytes()))
+            del img, pix
+    finally:
+        doc.close()
+    return rendered
+
+
+def _chunks(pages, size):
+    for i in range(0, len(pages), size):
+        yield pages[i:i + size]
+
+
+def render_pages(pdf_path, pages=None, min_size=None, cell_cm=None, dpi=LASER_DPI, mode="RGB",
+                 workers=None, progress=None, chunk_size=CHUNK_SIZE, window=None, trim=False):
+    """
+    Rasteriza las páginas `pages` (índices base 0; por defecto todas) de
+    `pdf_path` repartiéndolas en un pool de procesos.
+
+    El zoom se planea con plan_zoom (min_size o cell_cm + dpi) y cada página
+    se renderiza una sola vez directamente en el modo pedido: "RGB", "L"
+    (escala de grises, un tercio de la memoria) o "1" (blanco y negro).
+
+    Genera tuplas (page_number, PIL.Image) en el orden original.
+    `progress(hechas, total)` se llama cada vez que se entrega una página.
+    `window` es el máximo de bloques en vuelo (por defecto workers *
+    WINDOW_PER_WORKER): quien consume el generador debe soltar cada imagen
+    para que la memoria no crezca con el número de páginas.
+    Con trim=True cada página se recorta a su contenido (content_bbox) y el
+    zoom se planea para ese recorte, no para la página completa.
+    """
+    if pages is None:
+        with fitz.open(pdf_path) as doc:
+            pages = list(range(doc.page_count))
+    else:
+        pages = list(pages)
+
+    total = len(pages)
+    workers = workers or default_workers()
+    window = max(1, window or workers * WINDOW_PER_WORKER)
+    chunks = list(_chunks(pages, chunk_size))
+    spec = {"min_size": min_size, "cell_cm": cell_cm, "dpi": dpi, "mode": mode, "trim": trim}
+    done = 0
+
+    if workers == 1 or len(chunks) == 1:
+        results = (_render_chunk(pdf_path, chunk, spec) for chunk in chunks)
+        for rendered in results:
+            for pno, img_mode, size, data in rendered:
+                done += 1
+                yield pno, Image.frombuffer(img_mode, size, data, "raw", img_mode, 0, 1)
+                if progress:
+                    progress(done, total)
+        return
+
+    logger.info(f"Rasterizando {total} páginas con {workers} procesos")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Ventana de tareas en vuelo: suficiente para mantener ocupados a todos
+        # los procesos sin acumular en memoria el documento completo
+        pending = deque()
+        queued = iter(chunks)
+        for chunk in queued:
+            pending.append(pool.submit(_render_chunk, pdf_path, chunk, spec))
+            if len(pending) >= window:
+                break
+
+        while pending:
+            rendered = pending.popleft().result()
+            next_chunk = next(queued, None)
+            if next_chunk is not None:
+                pending.append(pool.submit(_render_chunk, pdf_path, next_chunk, spec))
+            for pno, img_mode, size, data in rendered:
+                done += 1
+                yield pno, Image.frombuffer(img_mode, size, data, "raw", img_mode, 0, 1)
+                if progress:
+                    progress(done, total)
@@ -0,0 +1,197 @@
+"""
+Script: reimprimir.py
+Descripción: Arma un solo PDF de reimpresión con las guías y packing slips de
+             una lista de números de guía, sin regenerar el archivo del día.
+Uso:
+  python reimprimir.py --archivo ~/Guias/originales GC2404293838166019 6042924807560
+  python reimprimir.py --archivo ~/Guias/originales --lista "GC2404293838166019', '6042924807560"
+Notas:
+  - Acepta el mismo formato de lista que separador.procesar_codigos.
+  - Las guías se buscan primero en el índice (indice_guias); las que no están
+    se buscan en la capa de texto de los PDF del archivo y quedan indexadas.
+  - En el PDF resultante van primero las guías (una por hoja, impresora
+    térmica) y después los slips, 4 por hoja Carta (impresora láser).
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+from clasificador import classify_pdf, pair_pages
+from imposicion import impose_pages, load_layout, save_pdf
+from indice_guias import LABEL_ROLE, TRACKING, index_pdf, lookup, stored_placements
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Archivos generados por nosotros: no son originales y no se recorren
+OUTPUT_MARKERS = (" - impresora ", " - tiktok", "medidas pequeñas", "medidas grandes", "Reimpresion")
+
+# Slips con la plantilla de la salida láser del fin de semana (7 x 12 cm)
+SLIP_LAYOUT = "fin_de_semana"
+
+
+def parse_codes(text):
+    """Separa una lista de códigos ("GC...', '604...", uno por renglón, con comas...)."""
+    return [code for code in re.split(r"[\s,'\"]+", text) if code]
+
+
+def _archive_pdfs(folders):
+    for folder in folders:
+        for dirpath, _, filenames in os.walk(folder):
+            for name in sorted(filenames):
+                if name.lower().endswith(".pdf") and not any(m in name for m in OUTPUT_MARKERS):
+                    yield os.path.join(dirpath, name)
+
+
+def _is_label(row):
+    """True si la página de la fila es la guía del par (el slip también trae el número de guía)."""
+    if row["role"]:
+        return row["role"] == LABEL_ROLE
+    # Filas indexadas antes de guardar el papel: en cada par la guía va antes que su slip
+    if row["pair_page"]:
+        return row["page"] < row["pair_page"]
+    return row["kind"] == TRACKING
+
+
+def _best(rows):
+    # Preferimos el original (tiene la pareja guía/slip), el más reciente que
+    # siga existiendo y, del mismo par, la fila de la guía
+    rows = [r for r in rows if os.path.exists(r["source"])]
+    rows.sort(key=lambda r: (r["pair_page"] is not None, r["date"], _is_label(r)), reverse=True)
+    return rows[0] if rows else None
+
+
+def _unresolved(row):
+    # Indexada sin pares (p. ej. desde la maquetación de 4 por hoja): no se sabe
+    # si la página es la guía o el slip ni cuál es su pareja
+    return row["role"] is None and row["pair_page"] is None
+
+
+def locate(codes, folders, db_path=None):
+    """
+    Encuentra cada código: {codigo: (archivo, pagina_guia, pagina_slip)} en
+    base 1 (None si falta alguna). Primero consulta el índice; los archivos
+    indexados sin pares se vuelven a revisar con el clasificador, y solo si
+    faltan códigos recorre los PDF de `folders`, indexándolos para la próxima vez.
+    """
+    def find(wanted):
+        rows = {code: _best(lookup(code, db_path)) for code in wanted}
+        return {code: row for code, row in rows.items() if row}
+
+    found = find(codes)
+    unpaired = {row["source"] for row in found.values() if _unresolved(row)}
+    for pdf_path in unpaired:
+        pairs, _ = pair_pages(classify_pdf(pdf_path))
+        index_pdf(pdf_path, stored_placements(pdf_path, db_path), pairs=pairs, db_path=db_path)
+    if unpaired:
+        found = find(codes)
+    missing = [c for c in codes if c not in found]
+    if missing:
+        indexed = {os.path.abspath(row["source"]) for row in found.values()}
+        for pdf_path in _archive_pdfs(folders):
+            if os.path.abspath(pdf_path) in indexed:
+                continue
+            try:
+                with fitz.open(pdf_path) as doc:
+                    text = "".join(page.get_text("text") for page in doc)
+            except Exception as e:
+                logger.warning(f"No se pudo leer {pdf_path}: {e}")
+                continue
+            if not any(code in text for code in missing):
+                continue
+            # Tiene alguno: se indexa completo con sus parejas guía/slip
+            pairs, _ = pair_pages(classify_pdf(pdf_path))
+            index_pdf(pdf_path, pairs=pairs, db_path=db_path)
+            missing = [c for c in missing if c not in find([c])]
+            if not missing:
+                break
+        # Con los archivos recién indexados puede haber una mejor coincidencia
+        found = find(codes)
+
+    for code in missing:
+        logger.error(f"❌ No se encontró la guía {code}")
+
+    result = {}
+    for code, row in found.items():
+        if _is_label(row):
+            result[code] = (row["source"], row["page"], row["pair_page"])
+        else:
+            result[code] = (row["source"], row["pair_page"], row["page"])
+    return result
+
+
+def build_reprint(locations, output_path):
+    """
+    Escribe el PDF de reimpresión en una sola pasada: primero las guías, una
+    por hoja y tal cual el original (térmica); luego los slips impuestos en
+    hojas Carta (láser). Cada PDF de origen se abre una sola vez.
+    Devuelve (guias, slips).
+    """
+    labels, slips = [], []
+    for source, label_page, slip_page in locations.values():
+        if label_page:
+            labels.append((source, label_page - 1))
+        if slip_page:
+            slips.append((source, slip_page - 1))
+    # Una guía y su pedido apuntan a las mismas páginas: cada una va una sola vez
+    labels = list(dict.fromkeys(labels))
+    slips = list(dict.fromkeys(slips))
+
+    sources = {}
+    out = fitz.open()
+    try:
+        for source, _ in labels + slips:
+            if source not in sources:
+                sources[source] = fitz.open(source)
+
+        for source, pno in labels:
+            out.insert_pdf(sources[source], from_page=pno, to_page=pno)
+
+        layout = load_layout(SLIP_LAYOUT)
+        impose_pages(None, [(sources[source], pno) for source, pno in slips], layout, out=out)
+
+        save_pdf(out, output_path)
+    finally:
+        out.close()
+        for doc in sources.values():
+            doc.close()
+
+    if labels:
+        logger.info(f"Térmica: hojas 1-{len(labels)} ({len(labels)} guías)")
+    if slips:
+        laser_sheets = -(-len(slips) // layout.per_sheet)
+        logger.info(f"Láser: hojas {len(labels) + 1}-{len(labels) + laser_sheets} ({len(slips)} slips)")
+    return len(labels), len(slips)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reimprime guías y slips por número de guía.")
+    parser.add_argument("codigos", nargs="*", help="Números de guía, pedido o SKU")
+    parser.add_argument("--lista", default="", help="Lista de códigos en el formato de separador.py")
+    parser.add_argument("--archivo", action="append", default=[],
+                        help="Carpeta con los PDF originales (se puede repetir)")
+    parser.add_argument("--salida", default=None, help="PDF de salida")
+    parser.add_argument("--db", default=None, help="Base del índice de guías")
+    args = parser.parse_args(argv)
+
+    codes = list(dict.fromkeys(args.codigos + parse_codes(args.lista)))
+    if not codes:
+        parser.error("No se indicó ningún código.")
+    folders = args.archivo or [os.path.join(os.path.expanduser("~"), "Desktop")]
+    output_path = args.salida or f"Reimpresion guias shein {datetime.now().strftime('%d-%m-%Y %H%M%S')}.pdf"
+
+    locations = locate(codes, folders, args.db)
+    if not locations:
+        return 1
+    build_reprint(locations, output_path)
+    return 0 if len(locations) == len(codes) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Script: rendimiento.py
+Descripción: Mide el rendimiento de las etapas del procesamiento de guías con
+             PDF sintéticos (guias_sinteticas.py) de 100, 1,000 y 5,000 páginas:
+             páginas por segundo y memoria pico de cada etapa. Los resultados
+             se agregan a un JSON para ver las regresiones con el tiempo.
+Uso:
+  python rendimiento.py
+  python rendimiento.py --paginas 100 1000 --etapas pdf_to_jpg separar --repeticiones 5
+  python rendimiento.py --salida rendimiento.json --fallar-si-regresion
+Notas:
+  - Cada repetición de cada etapa corre en un proceso nuevo, para que la
+    memoria pico de una etapa no incluya la de las anteriores. La de los
+    procesos de rasterizado se reporta aparte (rss_pico_hijos_mb).
+  - Como pytest-benchmark: se reportan mínimo, mediana, media y desviación
+    de los tiempos, y las páginas por segundo salen de la mediana.
+  - Los PDF generados se guardan en la carpeta de trabajo y se reutilizan
+    en las siguientes corridas (misma semilla → mismo PDF).
+  - Las métricas por etapa (metricas.py) de las repeticiones van a su propio
+    archivo (--metricas), no al historial de las corridas reales.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from queue import Empty
+
+import fitz  # PyMuPDF
+import PIL
+
+# resource solo existe en Linux/macOS; en Windows la memoria se lee con psutil, si está
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from guias_sinteticas import generate_pdf
+
+logger = logging.getLogger(__name__)
+
+PAGINAS = (100, 1000, 5000)
+REPETICIONES = 3
+SALIDA = "rendimiento.json"
+TRABAJO = os.path.join(tempfile.gettempdir(), "guias-rendimiento")
+# JSON lines de metricas.py durante las mediciones, dentro de la carpeta de
+# trabajo (se pasa por GUIAS_METRICAS)
+METRICAS = "metricas.jsonl"
+
+# Una etapa más lenta que esto respecto a la corrida anterior es regresión
+TOLERANCIA = 0.10
+
+# Tamaño mínimo de las imágenes de GuiasSheinUi
+MIN_WIDTH, MIN_HEIGHT = 896, 1538
+
+
+# ------------------------------ Etapas ------------------------------
+# Cada etapa recibe el PDF de entrada, una carpeta de trabajo vacía y el
+# número de procesos; hace el trabajo completo de esa etapa tal como lo hace
+# el programa, sin diálogos.
+
+def stage_classify(pdf_path, work_dir, workers):
+    from clasificador import classify_pdf
+    classify_pdf(pdf_path)
+
+
+def stage_pdf_to_jpg(pdf_path, work_dir, workers):
+    from GuiasSheinUi import pdf_to_jpg
+    for _ in pdf_to_jpg(pdf_path, work_dir, MIN_WIDTH, MIN_HEIGHT, workers=workers):
+        pass
+
+
+def stage_split(pdf_path, work_dir, workers):
+    from imposicion import split_odd_even
+    split_odd_even(pdf_path, os.path.join(work_dir, "impares.pdf"), os.path.join(work_dir, "pares.pdf"))
+
+
+def stage_layout(pdf_path, work_dir, workers):
+    # Solo la imposición en memoria (4 por hoja), sin escribir el PDF
+    from imposicion import impose_pages, load_layout
+    with fitz.open(pdf_path) as src:
+        impose_pages(src, range(src.page_count), load_layout("canguros")).close()
+
+
+def stage_write(pdf_path, work_dir, workers):
+    # Imposición más la escritura del PDF final (compresión y limpieza)
+    from imposicion import impose_pdf
+    impose_pdf(pdf_path, os.path.join(work_dir, "canguros.pdf"), "canguros")
+
+
+def stage_laser(pdf_path, work_dir, workers):
+    # Slips rasterizados → PDF láser directo (1 bit CCITT G4)
+    from imposicion import impose_images, load_layout, save_pdf
+    from rasterizador import LASER_DPI, render_pages
+    layout = load_layout("laser")
+    with fitz.open(pdf_path) as src:
+        slips = list(range(1, src.page_count, 2))
+    render = render_pages(pdf_path, pages=slips, cell_cm=(layout.cell_w_cm, None), dpi=LASER_DPI, mode="L",
+                          workers=workers)
+    out = impose_images((img for _, img in render), layout)
+    try:
+        save_pdf(out, os.path.join(work_dir, "laser.pdf"))
+    finally:
+        out.close()
+
+
+ETAPAS = {
+    "clasificar": stage_classify,
+    "pdf_to_jpg": stage_pdf_to_jpg,
+    "separar": stage_split,
+    "maquetar": stage_layout,
+    "escribir": stage_write,
+    "laser": stage_laser,
+}
+
+
+# ------------------------------ Medición ------------------------------
+def _peak_rss_mb(who="self"):
+    """Memoria residente pico (MB) del proceso o de sus hijos; None si no se puede medir."""
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+        # Linux reporta KB y macOS bytes
+        return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    if psutil is not None and who == "self":
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+
+def _run_stage(name, pdf_path, work_dir, workers, queue):
+    # Proceso hijo: una sola etapa, medida desde cero
+    logging.disable(logging.INFO)
+    start = time.perf_counter()
+    try:
+        ETAPAS[name](pdf_path, work_dir, workers)
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+        return
+    elapsed = time.perf_counter() - start
+    queue.put({"segundos": elapsed, "rss_pico_mb": _peak_rss_mb("self"),
+               "rss_pico_hijos_mb": _peak_rss_mb("children")})
+
+
+def measure(name, pdf_path, pages, rounds, workers, work_root):
+    """Corre la etapa `rounds` veces (cada una en un proceso nuevo) y resume los tiempos."""
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for i in range(rounds):
+        work_dir = os.path.join(work_root, f"{name}-{pages}-{i}")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_stage, args=(name, pdf_path, work_dir, workers, queue))
+        proc.start()
+        proc.join()
+        try:
+            result = queue.get(timeout=5)
+        except Empty:
+            # El proceso murió sin reportar (p. ej. se quedó sin memoria)
+            result = {"error": f"el proceso terminó con código {proc.exitcode}"}
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if "error" in result:
+            raise RuntimeError(f"La etapa {name} falló con {pages} páginas: {result['error']}")
+        runs.append(result)
+
+    times = [r["segundos"] for r in runs]
+    median = statistics.median(times)
+
+    def peak(key):
+        values = [r[key] for r in runs if r[key] is not None]
+        return round(max(values), 1) if values else None
+
+    return {
+        "etapa": name,
+        "paginas": pages,
+        "repeticiones": rounds,
+        "tiempos_s": [round(t, 4) for t in times],
+        "min_s": round(min(times), 4),
+        "mediana_s": round(median, 4),
+        "media_s": round(statistics.mean(times), 4),
+        "desv_s": round(statistics.stdev(times), 4) if len(times) > 1 else 0.0,
+        "paginas_por_s": round(pages / median, 1) if median else None,
+        "rss_pico_mb": peak("rss_pico_mb"),
+        "rss_pico_hijos_mb": peak("rss_pico_hijos_mb"),
+    }
+
+
+def synthetic_pdf(pages, work_root, brand="shein", seed=0):
+    """PDF sintético de `pages` páginas; se genera una sola vez y se reutiliza."""
+    path = os.path.join(work_root, f"sinteticas-{brand}-{pages}-s{seed}.pdf")
+    if not os.path.isfile(path):
+        logger.info(f"Generando PDF sintético de {pages} páginas...")
+        generate_pdf(path + ".tmp", pages, brand, seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def compare(previous, current, tolerance=TOLERANCIA):
+    """
+    Compara con una corrida anterior (misma etapa y páginas). Devuelve la
+    lista de regresiones como texto: etapas más lentas que `tolerance`.
+    """
+    before = {(r["etapa"], r["paginas"]): r for r in previous.get("resultados", [])}
+    regressions = []
+    for r in current["resultados"]:
+        old = before.get((r["etapa"], r["paginas"]))
+        if not old or not old.get("paginas_por_s") or not r["paginas_por_s"]:
+            continue
+        change = r["paginas_por_s"] / old["paginas_por_s"] - 1
+        line = (f"{r['etapa']:<11} {r['paginas']:>5} págs: {old['paginas_por_s']:.1f} → "
+                f"{r['paginas_por_s']:.1f} págs/s ({change:+.1%})")
+        logger.info(f"vs. {previous.get('commit') or previous.get('fecha')}: {line}")
+        if change < -tolerance:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de las etapas con guías sintéticas.")
+    parser.add_argument("--paginas", type=int, nargs="+", default=list(PAGINAS), help="Tamaños de PDF a medir")
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=list(ETAPAS), help="Etapas a medir")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES, help="Corridas por etapa y tamaño")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos para rasterizar (por defecto, todos)")
+    parser.add_argument("--marca", choices=("shein", "tiktok"), default="shein", help="Formato de las guías")
+    parser.add_argument("--salida", default=SALIDA, help="JSON donde se acumulan los resultados")
+    parser.add_argument("--trabajo", default=TRABAJO, help="Carpeta para los PDF sintéticos y las salidas")
+    parser.add_argument("--metricas", default=None,
+                        help=f"JSON lines para las métricas por etapa de las mediciones (por defecto {METRICAS} "
+                             f"en la carpeta de trabajo; vacío = no se escriben)")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help="Caída de páginas/s que cuenta como regresión (0.10 = 10 %%)")
+    parser.add_argument("--fallar-si-regresion", action="store_true",
+                        help="Terminar con código 1 si alguna etapa es más lenta que la corrida anterior")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.trabajo, exist_ok=True)
+    # Los procesos de cada etapa heredan la variable: sus etapas no se mezclan
+    # con las de ~/guias_metricas.jsonl
+    os.environ["GUIAS_METRICAS"] = (os.path.join(args.trabajo, METRICAS) if args.metricas is None
+                                    else args.metricas)
+    run = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "pillow": PIL.__version__,
+        "sistema": platform.platform(),
+        "cpus": os.cpu_count(),
+        "procesos": args.procesos,
+        "marca": args.marca,
+        "resultados": [],
+    }
+
+    for pages in args.paginas:
+        pdf_path = synthetic_pdf(pages, args.trabajo, args.marca)
+        for name in args.etapas:
+            result = measure(name, pdf_path, pages, args.repeticiones, args.procesos, args.trabajo)
+            run["resultados"].append(result)
+            rss = f"{result['rss_pico_mb']} MB" if result["rss_pico_mb"] is not None else "-"
+            logger.info(f"{name:<11} {pages:>5} págs: mediana {result['mediana_s']:.3f} s, "
+                        f"{result['paginas_por_s']} págs/s, RSS pico {rss} "
+                        f"(+{result['rss_pico_hijos_mb'] or 0} MB en procesos de render)")
+
+    history = load_history(args.salida)
+    # Solo se compara contra una corrida con la misma configuración
+    same = [h for h in history if all(h.get(k) == run[k] for k in ("cpus", "procesos", "marca"))]
+    regressions = compare(same[-1], run, args.tolerancia) if same else []
+    history.append(run)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    logger.info(f"Resultados agregados a {args.salida} ({len(history)} corridas)")
+
+    for line in regressions:
+        logger.warning(f"⚠ Regresión: {line}")
+    return 1 if regressions and args.fallar_si_regresion else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -1,13 +1,20 @@
 import os
 import fitz  # PyMuPDF
-from PIL import Image
 from docx import Document
-from docx.shared import Cm, Inches
+from docx.shared import Cm, Inches, Pt
 from docx.enum.table import WD_ROW_HEIGHT_RULE
 import tkinter as tk
 from tkinter import filedialog
 from datetime import datetime
 import logging
+from imposicion import extract_pages, impose_images, layout_for_brand, save_pdf
+from rasterizador import render_pages, encode_image, LASER_DPI
+from exportar_zpl import export_labels
+from cache_guias import OUTPUTS, cached_call
+from bitacora import Journal
+from metricas import run, stage, timed_iter
+from indice_guias import placements_for, safe_index_pdf
+from clasificador import classify_pdf, log_classification, sort_pairs_by_sku, LABEL, SLIP, BLANK
 
 # Intentar importar docx2pdf para conversión Word->PDF
 try:
@@ -55,7 +62,208 @@ def ask_brand():
     return sel.get('brand', '')
 
 # --------------------------- LÓGICA ------------------------------
-def split_and_compile(root):
+def process_pdf(pdf_path, brand, output_folder, today, save_images=False, thermal_format="pdf", use_cache=True,
+                sort_by_sku=False):
+    """
+    Genera las salidas de un PDF sin diálogos: guías → archivo térmico y
+    slips → DOCX/PDF láser (o TikTok, 2 por hoja). Devuelve un resumen.
+
+    Si el mismo PDF ya se procesó con la misma marca y formato, las salidas
+    se restauran del caché sin volver a rasterizar ni convertir. Con
+    sort_by_sku=True las guías y los slips salen en orden de surtido.
+    """
+    params = {"script": "split_and_compile", "brand": brand, "today": today, "thermal_format": thermal_format,
+              "sort_by_sku": sort_by_sku, "plantilla": layout_for_brand(brand, "laser").spec,
+              # Codificación de las imágenes láser: las salidas en caché de antes (PNG 8 bits) no valen
+              "codificacion": "1bit-g4"}
+    # Tiempos por etapa en JSON lines y un resumen al terminar (metricas)
+    with run(os.path.basename(pdf_path)):
+        return cached_call(pdf_path, params, output_folder, _process_pdf, pdf_path, brand, output_folder, today,
+                           save_images, thermal_format, params, sort_by_sku, enabled=use_cache and not save_images)
+
+def build_laser_docx(pdf_path, slip_pages, brand, output_folder, docx_path, save_images=False, laser_pdf=None):
+    """
+    Rasteriza los slips `slip_pages` (base 1) y los acomoda en un DOCX Carta
+    (4 por hoja, o 2 por hoja en TikTok). Con `laser_pdf` también escribe el
+    PDF láser directamente, sin Word. Devuelve cuántos slips se colocaron.
+    """
+    # Crear DOCX tamaño Carta
+    doc_word = Document()
+    for section in doc_word.sections:
+        section.page_width = Inches(8.5)
+        section.page_height = Inches(11)
+        section.left_margin = Cm(0.5)
+        section.right_margin = Cm(0.5)
+        section.top_margin = Cm(0.5)
+        section.bottom_margin = Cm(0.5)
+
+    # Parámetros de maquetación de la plantilla de la marca (plantillas/<marca>.json
+    # o plantillas/laser.json); TikTok: 2 por hoja a casi todo el ancho útil
+    layout = layout_for_brand(brand, "laser")
+    per_page = layout.per_sheet
+    rows, cols = layout.rows, layout.cols
+
+    # Render único en escala de grises al tamaño físico de la celda (300 dpi);
+    # solo se rasterizan los slips, las páginas en blanco ya se descartaron.
+    # Es un generador: cada slip se coloca en cuanto llega y solo quedan en
+    # memoria las imágenes de la ventana de render_pages, no las del PDF completo
+    render = timed_iter("rasterizar", render_pages(pdf_path, pages=[idx - 1 for idx in slip_pages],
+                                                   cell_cm=(layout.cell_w_cm, layout.cell_h_cm), dpi=LASER_DPI,
+                                                   mode="L", trim=layout.trim))
+
+    count = 0
+
+    def placed():
+        """Coloca cada slip en el DOCX y lo pasa a la siguiente etapa (PDF directo)."""
+        nonlocal count
+        table = None
+        for pno, img in render:
+            idx = pno + 1
+            if count % per_page == 0:
+                table = doc_word.add_table(rows=rows, cols=cols)
+                table.autofit = False
+                table.allow_autofit = False
+
+                if layout.rows_exact:
+                    # Forzar que cada fila mida exactamente la altura de la celda
+                    # (en TikTok, media página útil)
+                    for row in table.rows:
+                        row.height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
+                        row.height = Cm(layout.cell_h_cm)
+
+            # Posición dentro de la página
+            pos = count % per_page
+            row_i = pos // cols
+            col_i = pos % cols
+            cell = table.cell(row_i, col_i)
+
+            # Insertar imagen a casi todo el ancho (sin rotar; en TikTok tampoco
+            # se rota); la imagen viaja en memoria y solo se escribe en disco si
+            # se pidió conservarla
+            if save_images:
+                img.save(os.path.join(output_folder, f"even_{idx}.png"))
+            picture_run = cell.paragraphs[0].add_run()
+            # Mismo tamaño que en el PDF directo: la plantilla ajusta a la celda
+            # (un slip recortado puede ser más alto en proporción que la página)
+            target = layout.placement(pos, fitz.Rect(0, 0, *img.size))
+            # Blanco y negro a 1 bit: el DOCX (y el PDF que sale de él) pesa una fracción
+            picture_run.add_picture(encode_image(img), width=Pt(target.width), height=Pt(target.height))
+
+            logger.info(f"Slip {idx} → hoja {count//per_page + 1}, celda ({row_i},{col_i}), modo {brand}")
+            count += 1
+
+            if count % per_page == 0:
+                doc_word.add_page_break()
+            yield img
+
+    if laser_pdf:
+        # Mismas imágenes y misma plantilla, en la misma pasada; los slips van
+        # en CCITT G4 de 1 bit
+        out = impose_images(placed(), layout)
+        try:
+            save_pdf(out, laser_pdf)
+        finally:
+            out.close()
+    else:
+        with stage("maquetar", plantilla=layout.name) as st:
+            for _ in placed():
+                st.pages += 1
+
+    with stage("guardar", pages=count, outputs=[docx_path]):
+        doc_word.save(docx_path)
+    logger.info(f"✅ DOCX guardado en: {docx_path}")
+    return count
+
+
+def _process_pdf(pdf_path, brand, output_folder, today, save_images, thermal_format, params, sort_by_sku):
+    # Abre PDF original
+    try:
+        with stage("abrir") as st:
+            # Solo para contar las páginas: cada etapa abre el PDF por su cuenta
+            with fitz.open(pdf_path) as doc:
+                st.pages = total = doc.page_count
+    except Exception as e:
+        logger.error(f"❌ No se pudo abrir el PDF: {e}")
+        return {"error": str(e)}
+
+    logger.info(f"Documento original: {total} páginas")
+
+    # Bitácora: si una corrida anterior se interrumpió, se reanuda desde la
+    # última etapa terminada (separado, DOCX, conversión)
+    journal = Journal.open(output_folder, pdf_path, params)
+
+    # Clasifica cada página (guía / slip / en blanco) con su capa de texto y
+    # dibujos, sin rasterizar; un slip faltante ya no recorre los pares
+    with stage("clasificar", pages=total):
+        classes = classify_pdf(pdf_path)
+        groups, pairs = log_classification(classes)
+    odd_indices = groups[LABEL]
+    even_indices = groups[SLIP]
+    skipped = groups[BLANK]
+
+    # Orden de surtido opcional: los pares guía/slip se agrupan por SKU y las
+    # dos salidas siguen el mismo orden
+    if sort_by_sku:
+        pairs = sort_pairs_by_sku(pdf_path, pairs)
+        odd_indices = [label for label, _ in pairs if label]
+        even_indices = [slip for _, slip in pairs if slip]
+
+    # --- A) GUÍAS → PDF térmico (una sola pasada con select + compresión) ---
+    #        o ZPL/EPL listo para mandar en crudo a la impresora
+    odd_name = f"{brand} Guias shein {today} - impresora termica.{thermal_format}"
+    odd_path = os.path.join(output_folder, odd_name)
+    if journal.stage_done("separado") is None:
+        # La escritura del archivo se mide aparte, como "guardar"
+        with stage("separar", pages=len(odd_indices)):
+            if thermal_format == "pdf":
+                extract_pages(pdf_path, {odd_path: odd_indices})
+            else:
+                export_labels(pdf_path, odd_indices, odd_path, fmt=thermal_format)
+        journal.complete("separado", [odd_path])
+        logger.info(f"Páginas de guías extraídas: {odd_indices}")
+        logger.info(f"✅ Archivo TÉRMICO guardado en: {odd_path}")
+
+    # --- B) SLIPS → DOCX según modo ---
+    logger.info(f"Índices de slips a procesar: {even_indices}")
+
+    if skipped:
+        logger.warning(f"Páginas en blanco omitidas: {skipped}")
+
+    out_suffix = "tiktok" if brand == "TikTok" else "impresora laser"
+    docx_name = f"{brand} Guias shein {today} - {out_suffix}.docx"
+    docx_path = os.path.join(output_folder, docx_name)
+    laser_name = f"{brand} Guias shein {today} - {out_suffix}.pdf"
+    laser_path = os.path.join(output_folder, laser_name)
+    # Sin docx2pdf (Linux, sin Word) el PDF láser se arma directo con las mismas imágenes
+    direct_pdf = None if convert else laser_path
+    done = journal.stage_done("docx")
+    if done is None:
+        laser_count = build_laser_docx(pdf_path, even_indices, brand, output_folder, docx_path, save_images,
+                                       laser_pdf=direct_pdf)
+        journal.complete("docx", [docx_path] + ([direct_pdf] if direct_pdf else []), laser=laser_count)
+    else:
+        laser_count = done["laser"]
+
+    # Convertir DOCX → PDF (si disponible)
+    if convert:
+        if journal.stage_done("convertido") is None:
+            with stage("convertir", pages=laser_count, outputs=[laser_path]):
+                convert(docx_path, laser_path)
+            journal.complete("convertido", [laser_path])
+            logger.info(f"✅ PDF ({out_suffix}) guardado en: {laser_path}")
+    else:
+        logger.info("docx2pdf no disponible; el PDF de pares se generó sin Word.")
+
+    # Índice tracking/pedido/SKU → archivo, página y hoja de salida
+    slips_per_sheet = layout_for_brand(brand, "laser").per_sheet
+    safe_index_pdf(pdf_path, placements_for(odd_indices, odd_path, even_indices, laser_path, slips_per_sheet), pairs)
+
+    journal.finish()
+    return {"paginas": total, "termicas": len(odd_indices), "laser": laser_count, "omitidas": len(skipped),
+            OUTPUTS: [odd_path, docx_path, laser_path]}
+
+
+def split_and_compile(root, save_images=False, thermal_format="pdf"):
     logger.info("▶ Iniciando split_and_compile()")
 
     # 1) Elige MARCA/MODO
@@ -84,133 +292,8 @@ def split_and_compile(root):
     os.makedirs(output_folder, exist_ok=True)
     logger.info(f"Carpeta de salida: {output_folder}")
 
-    # 4) Abre PDF original
-    try:
-        doc = fitz.open(pdf_path)
-    except Exception as e:
-        logger.error(f"❌ No se pudo abrir el PDF: {e}")
-        root.quit()
-        return
-
-    total = doc.page_count
-    logger.info(f"Documento original: {total} páginas")
-
-    # --- A) IMPARES → PDF térmico ---
-    odd_pdf = fitz.open()
-    odd_indices = []
-    for i in range(total):
-        if (i + 1) % 2 == 1:
-            odd_pdf.insert_pdf(doc, from_page=i, to_page=i)
-            odd_indices.append(i + 1)
-
-    exp_odds = (total + 1) // 2
-    if len(odd_indices) != exp_odds:
-        logger.warning(f"Mismatch impares: esperadas={exp_odds}, extraídas={len(odd_indices)} ({odd_indices})")
-    else:
-        logger.info(f"Páginas impares extraídas: {odd_indices}")
-
-    odd_name = f"{brand} Guias shein {today} - impresora termica.pdf"
-    odd_path = os.path.join(output_folder, odd_name)
-    odd_pdf.save(odd_path)
-    logger.info(f"✅ PDF TÉRMICO guardado en: {odd_path}")
-
-    # --- B) PARES → DOCX según modo ---
-    even_indices = [i + 1 for i in range(total) if (i + 1) % 2 == 0]
-    logger.info(f"Índices pares a procesar: {even_indices}")
-
-    images = []
-    skipped = []
-    scale = 2  # factor de zoom para mayor resolución
-    for idx in even_indices:
-        page = doc.load_page(idx - 1)
-        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-
-        if img.getbbox() is None:
-            skipped.append(idx)
-            continue
-
-        # En modo TikTok no rotamos (requisito actual)
-        images.append((idx, img))
-
-    if skipped:
-        logger.warning(f"Páginas pares en blanco omitidas: {skipped}")
-
-    # Crear DOCX tamaño Carta
-    doc_word = Document()
-    for section in doc_word.sections:
-        section.page_width = Inches(8.5)
-        section.page_height = Inches(11)
-        section.left_margin = Cm(0.5)
-        section.right_margin = Cm(0.5)
-        section.top_margin = Cm(0.5)
-        section.bottom_margin = Cm(0.5)
-
-    # Tomamos medidas útiles en CM para evitar floats sueltos
-    section = doc_word.sections[0]
-    usable_w_cm = section.page_width.cm - section.left_margin.cm - section.right_margin.cm
-    usable_h_cm = section.page_height.cm - section.top_margin.cm - section.bottom_margin.cm
-
-    # Parámetros de maquetación según modo
-    if brand == "TikTok":
-        per_page = 2
-        rows, cols = 2, 1
-        picture_width = Cm(usable_w_cm * 0.98)   # casi todo el ancho útil
-        out_suffix = "tiktok"
-    else:
-        per_page = 4
-        rows, cols = 2, 2
-        picture_width = Cm(7.0)                  # tamaño previo
-        out_suffix = "impresora laser"
-
-    count = 0
-    table = None
-    for idx, img in images:
-        if count % per_page == 0:
-            table = doc_word.add_table(rows=rows, cols=cols)
-            table.autofit = False
-            table.allow_autofit = False
-
-            if brand == "TikTok":
-                # Forzar que cada fila mida exactamente media página útil
-                half_h_cm = usable_h_cm / 2.0
-                for r in range(2):
-                    row = table.rows[r]
-                    row.height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
-                    row.height = Cm(half_h_cm)   # <-- ahora es Length, no float
-
-        # Posición dentro de la página
-        pos = count % per_page
-        row_i = pos // cols
-        col_i = pos % cols
-        cell = table.cell(row_i, col_i)
-
-        # Insertar imagen a casi todo el ancho (sin rotar)
-        temp_png = os.path.join(output_folder, f"even_{idx}.png")
-        img.save(temp_png, quality=100)
-        run = cell.paragraphs[0].add_run()
-        run.add_picture(temp_png, width=picture_width)
-
-        logger.info(f"Par {idx} → hoja {count//per_page + 1}, celda ({row_i},{col_i}), modo {brand}")
-        count += 1
-
-        if count % per_page == 0:
-            doc_word.add_page_break()
-
-    # Guardar DOCX
-    docx_name = f"{brand} Guias shein {today} - {out_suffix}.docx"
-    docx_path = os.path.join(output_folder, docx_name)
-    doc_word.save(docx_path)
-    logger.info(f"✅ DOCX guardado en: {docx_path}")
-
-    # 5) Convertir DOCX → PDF (si disponible)
-    if convert:
-        pdf_name = f"{brand} Guias shein {today} - {out_suffix}.pdf"
-        pdf_path = os.path.join(output_folder, pdf_name)
-        convert(docx_path, pdf_path)
-        logger.info(f"✅ PDF ({out_suffix}) guardado en: {pdf_path}")
-    else:
-        logger.error("docx2pdf no disponible; se omitió conversión a PDF de pares.")
+    # 4) Procesa el PDF
+    process_pdf(pdf_path, brand, output_folder, today, save_images, thermal_format)
 
     logger.info("▶ Proceso completado exitosamente.")
     root.quit()
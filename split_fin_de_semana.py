@@ -1,12 +1,19 @@
 import os
 import fitz  # PyMuPDF
-from PIL import Image
 from docx import Document
-from docx.shared import Cm, Inches
+from docx.shared import Cm, Inches, Pt
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from datetime import datetime
 import logging
+from rasterizador import render_pages, encode_image, LASER_DPI
+from exportar_zpl import export_labels
+from imposicion import extract_pages, impose_images, load_layout, save_pdf
+from indice_guias import placements_for, safe_index_pdf
+from clasificador import classify_pdf, log_classification, sort_pairs_by_sku, LABEL, SLIP, BLANK
+from duplicados import dedupe_weekend
+from lotes import run_days_concurrently
+from metricas import run, stage, timed_iter
 
 # Intentar importar docx2pdf para conversión Word->PDF
 try:
@@ -104,67 +111,85 @@ def ensure_output_folder(brand):
     os.makedirs(output_folder, exist_ok=True)
     return output_folder, today
 
-def process_pdf_for_day(pdf_path, brand, output_folder, today, day_label=None):
+def process_pdf_for_day(pdf_path, brand, output_folder, today, day_label=None, save_images=False,
+                        thermal_format="pdf", progress=None, workers=None, sort_by_sku=False):
     """
     Procesa un PDF con la lógica original. Si day_label está presente,
-    lo agrega a los nombres de los archivos de salida.
+    lo agrega a los nombres de los archivos de salida. Con save_images=True
+    también deja en la carpeta los PNG de las páginas pares. thermal_format
+    elige la salida de las guías: "pdf", "zpl" o "epl".
+
+    progress(porcentaje, mensaje) informa el avance del rasterizado y
+    workers limita los procesos que usa. Con sort_by_sku=True las guías y
+    los slips salen en orden de surtido (por SKU). Devuelve un resumen del día.
     """
+    # Tiempos por etapa en JSON lines y un resumen al terminar (metricas)
+    with run(f"{os.path.basename(pdf_path)} ({day_label or 'Único'})"):
+        return _process_pdf_for_day(pdf_path, brand, output_folder, today, day_label, save_images, thermal_format,
+                                    progress, workers, sort_by_sku)
+
+
+def _process_pdf_for_day(pdf_path, brand, output_folder, today, day_label, save_images, thermal_format, progress,
+                         workers, sort_by_sku):
     try:
-        doc = fitz.open(pdf_path)
+        with stage("abrir") as st:
+            # Solo para contar las páginas: cada etapa abre el PDF por su cuenta
+            with fitz.open(pdf_path) as doc:
+                st.pages = total = doc.page_count
     except Exception as e:
         logger.error(f"❌ No se pudo abrir el PDF ({day_label or 'Único'}): {e}")
-        return
+        return {"error": str(e)}
 
-    total = doc.page_count
     logger.info(f"[{day_label or 'Único'}] Documento original: {total} páginas")
 
-    # --- A) IMPARES → PDF térmico ---
-    odd_pdf = fitz.open()
-    odd_indices = []
-    for i in range(total):
-        if (i + 1) % 2 == 1:
-            odd_pdf.insert_pdf(doc, from_page=i, to_page=i)
-            odd_indices.append(i + 1)
-
-    exp_odds = (total + 1) // 2
-    if len(odd_indices) != exp_odds:
-        logger.warning(f"[{day_label or 'Único'}] Mismatch impares: esperadas={exp_odds}, extraídas={len(odd_indices)} ({odd_indices})")
-    else:
-        logger.info(f"[{day_label or 'Único'}] Páginas impares extraídas: {odd_indices}")
-
+    # Clasifica cada página (guía / slip / en blanco) con su capa de texto y
+    # dibujos, sin rasterizar; un slip faltante ya no recorre los pares
+    with stage("clasificar", pages=total):
+        classes = classify_pdf(pdf_path)
+        groups, pairs = log_classification(classes, prefix=f"[{day_label or 'Único'}] ")
+    odd_indices = groups[LABEL]
+    even_indices = groups[SLIP]
+    skipped = groups[BLANK]
+
+    # Orden de surtido opcional: los pares guía/slip se agrupan por SKU y las
+    # dos salidas siguen el mismo orden
+    if sort_by_sku:
+        pairs = sort_pairs_by_sku(pdf_path, pairs)
+        odd_indices = [label for label, _ in pairs if label]
+        even_indices = [slip for _, slip in pairs if slip]
+
+    # --- A) GUÍAS → PDF térmico (una sola pasada con select + compresión) ---
     day_chunk = f" - {day_label}" if day_label else ""
 
-    odd_name = f"{brand} Guias shein {today}{day_chunk} - impresora termica.pdf"
+    odd_name = f"{brand} Guias shein {today}{day_chunk} - impresora termica.{thermal_format}"
     odd_path = os.path.join(output_folder, odd_name)
-    odd_pdf.save(odd_path)
-    odd_pdf.close()
-    logger.info(f"✅ [{day_label or 'Único'}] PDF TÉRMICO guardado en: {odd_path}")
-
-    # --- B) PARES → DOCX (4 por hoja) + PDF láser ---
-    even_indices = [i + 1 for i in range(total) if (i + 1) % 2 == 0]
-    logger.info(f"[{day_label or 'Único'}] Índices pares que deberían procesarse: {even_indices}")
-
-    images = []
-    skipped = []
-    scale = 2  # factor de zoom para mayor resolución
-    for idx in even_indices:
-        page = doc.load_page(idx - 1)
-        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        if img.getbbox() is None:
-            skipped.append(idx)
-            continue
-        images.append((idx, img))
+    with stage("separar", pages=len(odd_indices)):
+        if thermal_format == "pdf":
+            extract_pages(pdf_path, {odd_path: odd_indices})
+        else:
+            # ZPL/EPL a la resolución nativa de la térmica, listo para mandar en crudo
+            export_labels(pdf_path, odd_indices, odd_path, fmt=thermal_format, workers=workers)
+    logger.info(f"[{day_label or 'Único'}] Páginas de guías extraídas: {odd_indices}")
+    logger.info(f"✅ [{day_label or 'Único'}] Archivo TÉRMICO guardado en: {odd_path}")
+
+    # --- B) SLIPS → DOCX (4 por hoja) + PDF láser ---
+    logger.info(f"[{day_label or 'Único'}] Índices de slips que deberían procesarse: {even_indices}")
+
+    # Render único en escala de grises al tamaño físico de la celda de la
+    # plantilla (7 x 12 cm a 300 dpi); solo se rasterizan los slips, las
+    # páginas en blanco ya se descartaron. Se consume como generador: cada
+    # slip se coloca en cuanto llega, así la memoria no crece con el PDF
+    layout = load_layout("fin_de_semana")
+    def on_render(done, total_even):
+        if progress:
+            progress(done / total_even * 100, f"Slip {done} de {total_even}")
+
+    render = timed_iter("rasterizar", render_pages(pdf_path, pages=[idx - 1 for idx in even_indices],
+                                                   cell_cm=(layout.cell_w_cm, layout.cell_h_cm), dpi=LASER_DPI,
+                                                   mode="L", workers=workers, progress=on_render, trim=layout.trim))
 
     if skipped:
-        logger.warning(f"[{day_label or 'Único'}] Páginas pares en blanco omitidas: {skipped}")
-    if len(images) != len(even_indices) - len(skipped):
-        logger.warning(
-            f"[{day_label or 'Único'}] Después de filtrar blancas: esperadas={len(even_indices)}, "
-            f"procesadas={len(images)}"
-        )
-    else:
-        logger.info(f"[{day_label or 'Único'}] Imágenes pares procesadas correctamente: {[i for i,_ in images]}")
+        logger.warning(f"[{day_label or 'Único'}] Páginas en blanco omitidas: {skipped}")
 
     # Crear DOCX tamaño Carta
     doc_word = Document()
@@ -177,57 +202,86 @@ def process_pdf_for_day(pdf_path, brand, output_folder, today, day_label=None):
         section.bottom_margin = Cm(0.5)
 
     # Incrustar imágenes 4 por hoja (ligeramente más pequeñas)
-    desired_w = Cm(7.0)
-    desired_h = Cm(12.0)
-    count = 0
-    table = None
-
-    for idx, img in images:
-        if count % 4 == 0:
-            table = doc_word.add_table(rows=2, cols=2)
-            table.autofit = False
-            table.allow_autofit = False
-
-        row = (count % 4) // 2
-        col = (count % 4) % 2
-        cell = table.cell(row, col)
-
-        # Temp PNG en la carpeta del día (o principal si no hay día)
-        temp_png = os.path.join(
-            output_folder,
-            f"{(day_label or 'unico').lower()}_even_{idx}.png"
-        )
-        img.save(temp_png, quality=100)
-        cell.paragraphs[0].add_run().add_picture(
-            temp_png,
-            width=desired_w,
-            height=desired_h
-        )
-        logger.info(f"[{day_label or 'Único'}] Insertada página par {idx} en tabla posición ({row},{col})")
-        count += 1
-
-        if count % 4 == 0:
-            doc_word.add_page_break()
+    per_page = layout.per_sheet
+    placed_pages = []
+
+    def placed():
+        """Coloca cada slip en el DOCX y lo pasa a la siguiente etapa (PDF directo)."""
+        table = None
+        for pno, img in render:
+            idx = pno + 1
+            count = len(placed_pages)
+            if count % per_page == 0:
+                table = doc_word.add_table(rows=layout.rows, cols=layout.cols)
+                table.autofit = False
+                table.allow_autofit = False
+
+            row = (count % per_page) // layout.cols
+            col = (count % per_page) % layout.cols
+            cell = table.cell(row, col)
+
+            # La imagen viaja en memoria; el PNG en la carpeta del día (o principal
+            # si no hay día) solo se escribe si se pidió conservarlo
+            if save_images:
+                img.save(os.path.join(
+                    output_folder,
+                    f"{(day_label or 'unico').lower()}_even_{idx}.png"
+                ))
+            # Ajustada a la celda como en el PDF directo, sin deformar el recorte;
+            # blanco y negro a 1 bit en lugar de PNG de 8 bits
+            target = layout.placement(count % per_page, fitz.Rect(0, 0, *img.size))
+            cell.paragraphs[0].add_run().add_picture(
+                encode_image(img),
+                width=Pt(target.width),
+                height=Pt(target.height)
+            )
+            logger.info(f"[{day_label or 'Único'}] Insertado slip {idx} en tabla posición ({row},{col})")
+            placed_pages.append(idx)
+
+            if len(placed_pages) % per_page == 0:
+                doc_word.add_page_break()
+            yield img
+
+    laser_name = f"{brand} Guias shein {today}{day_chunk} - impresora laser.pdf"
+    laser_pdf = os.path.join(output_folder, laser_name)
+    if convert:
+        with stage("maquetar", plantilla=layout.name) as st:
+            for _ in placed():
+                st.pages += 1
+    else:
+        # Sin Word: el PDF láser se arma directo en la misma pasada con las
+        # mismas imágenes (1 bit CCITT G4)
+        direct = impose_images(placed(), layout)
+    logger.info(f"[{day_label or 'Único'}] Slips procesados correctamente: {placed_pages}")
 
     # Guardar DOCX
     docx_name = f"{brand} Guias shein {today}{day_chunk} - impresora laser.docx"
     docx_path = os.path.join(output_folder, docx_name)
-    doc_word.save(docx_path)
+    with stage("guardar", pages=len(placed_pages), outputs=[docx_path]):
+        doc_word.save(docx_path)
     logger.info(f"✅ [{day_label or 'Único'}] DOCX guardado en: {docx_path}")
 
     # Convertir DOCX → PDF láser
+    laser_path = docx_path
     if convert:
         try:
-            laser_name = f"{brand} Guias shein {today}{day_chunk} - impresora laser.pdf"
-            laser_path = os.path.join(output_folder, laser_name)
-            convert(docx_path, laser_path)
+            with stage("convertir", pages=len(placed_pages), outputs=[laser_pdf]):
+                convert(docx_path, laser_pdf)
+            laser_path = laser_pdf
             logger.info(f"✅ [{day_label or 'Único'}] PDF LÁSER guardado en: {laser_path}")
         except Exception as e:
             logger.error(f"❌ [{day_label or 'Único'}] Error al convertir DOCX a PDF: {e}")
     else:
-        logger.error(f"[{day_label or 'Único'}] docx2pdf no disponible; se omitió conversión a PDF láser.")
+        try:
+            save_pdf(direct, laser_pdf)
+            laser_path = laser_pdf
+        finally:
+            direct.close()
 
-    doc.close()
+    # Índice tracking/pedido/SKU → archivo, página y hoja de salida
+    safe_index_pdf(pdf_path, placements_for(odd_indices, odd_path, even_indices, laser_path, per_page), pairs)
+
+    return {"paginas": total, "termicas": len(odd_indices), "laser": len(placed_pages), "omitidas": len(skipped)}
 
 def split_and_compile(root):
     logger.info("▶ Iniciando split_and_compile()")
@@ -259,12 +313,29 @@ def split_and_compile(root):
                 return
             paths[d] = p
 
-        # Crear subcarpetas por día y procesar
-        for d in days:
+        # Los tres exports a veces se traslapan: los pedidos que ya venían en
+        # un día anterior se quitan antes de rasterizar (reporte en la carpeta)
+        paths, _ = dedupe_weekend(paths, output_folder)
+
+        # Crear subcarpetas por día y procesar los tres días a la vez,
+        # cada uno en su propio proceso
+        jobs = {}
+        for d in paths:
             day_dir = os.path.join(output_folder, d)
             os.makedirs(day_dir, exist_ok=True)
             logger.info(f"▶ Procesando {d} en carpeta: {day_dir}")
-            process_pdf_for_day(paths[d], brand, day_dir, today, day_label=d)
+            jobs[d] = ((paths[d], brand, day_dir, today), {"day_label": d})
+
+        last_step = {}
+
+        def on_progress(day, percent, overall, message):
+            # Un renglón por cada 10% de avance de cada día
+            step = int(percent // 10)
+            if last_step.get(day) != step:
+                last_step[day] = step
+                logger.info(f"[{day}] {percent:.0f}% - {message} (total {overall:.0f}%)")
+
+        run_days_concurrently(process_pdf_for_day, jobs, on_progress)
 
         logger.info("▶ Proceso de fin de semana completado exitosamente.")
     else: